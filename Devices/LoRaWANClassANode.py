@@ -1,18 +1,56 @@
 import Hardware.EVENTS
 import Physics.Environment
+from Hardware.EVENTS import ClassA as E
+from Hardware.STATES import ClassA as S
+from Utils.StateMachine import ANY, StateMachine, Transition, on
 import Utils.TrafficModel
 import Utils.Computations as cmp
 import Wireless.signals
 from Hardware.LoRaModule import sleep
 from Hardware.SensorNode import SensorNode
+import math
 import random
 
+UPLINK_PAYLOAD = {"messages": "DUMMY"} # Shared by every uplink packet, never modified
+_SIZED_PAYLOADS: dict = {} # payload size -> shared payload of that size, for trace driven traffic
+
 class LoRaWANNode(SensorNode):
 
     def __init__(self, node_id: str, wurx_json: str, lora_json: str, position: Wireless.signals.Location):
         super().__init__(node_id, wurx_json, lora_json, position)
         self.event_generator: Utils.TrafficModel.TrafficModel = Utils.TrafficModel.TrafficModel()
-        self.action.executable, self.action.args = sleep, []
+        self.enter(S.SLEEP, 0, None)
+
+    STATE_ACTIONS = {
+        S.SLEEP: lambda node, time, environment: (sleep, []),
+        S.GENERATE_PACKET: lambda node, time, environment: (
+            node.lora.generate_packet, [time, node.uplink_payload(), {"destination": "00000"}]),
+        S.TRANSMIT_PACKET: lambda node, time, environment: (node.lora.transmit_packet, []),
+        S.RECEIVE_DELAY_1: lambda node, time, environment: (node.receive_delay_1, []),
+        S.RX_1: lambda node, time, environment: (node.rx_1, [environment]),
+        S.RECEIVE_DELAY_2: lambda node, time, environment: (node.receive_delay_2, []),
+        S.RX_2: lambda node, time, environment: (node.rx_2, [environment]),
+        S.JOIN_DELAY: lambda node, time, environment: (
+            node.lora.sleep_delay, [Utils.Computations.spaced_delay_from_id(node.lora.ID)]),
+        S.JOIN_PACKET_GENERATION: lambda node, time, environment: (node.join_packet_generation, [time]),
+        S.DECODE_JOIN_ACCEPT: lambda node, time, environment: (node.decode_join_accept, []),
+        S.CONTENTION_WINDOW_DELAY: lambda node, time, environment: (node.contention_window_delay, []),
+    }
+
+    def uplink_payload(self) -> dict:
+        """Payload of the uplink being generated; an arrival read from a trace also sets its SF."""
+        arrival = self.event_generator.arrival
+        if arrival is None:
+            return UPLINK_PAYLOAD
+        if arrival.sf is not None and arrival.sf != self.lora.SF:
+            self.lora.SF = arrival.sf
+            self.lora.RSSI = self.lora.rssi_by_sf[arrival.sf]
+        if arrival.payload_size is None:
+            return UPLINK_PAYLOAD
+        payload = _SIZED_PAYLOADS.get(arrival.payload_size)
+        if payload is None:
+            payload = _SIZED_PAYLOADS[arrival.payload_size] = {"messages": "x" * arrival.payload_size}
+        return payload
 
     def receive_delay_1(self):
         # print("RX DELAY 1")
@@ -27,7 +65,9 @@ class LoRaWANNode(SensorNode):
 
     def contention_window_delay(self):
         # print("RX DELAY 1")
-        time: int = Utils.Computations.spaced_delay_from_id(self.lora.ID) + random.randint(0, 5000) # contention delay initialized to 50 sec
+        time: int = 0
+        if self.lora.counter is None: # Drawn once when the window starts, both engines draw alike
+            time = Utils.Computations.spaced_delay_from_id(self.lora.ID) + random.randint(0, 5000) # contention delay initialized to 50 sec
         signal, _ = self.lora.sleep_delay(time)
         if signal == Hardware.EVENTS.ClassA.DELAY_START:
             return Hardware.EVENTS.ClassA.CONTENTION_WINDOW_START, None
@@ -92,88 +132,80 @@ class LoRaWANNode(SensorNode):
 
         return Hardware.EVENTS.ClassA.JOIN_ACCEPT_FAILED, None
 
-    def protocol_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
-                        environment: Physics.Environment.Environment):
-
-        if self.action.executable == sleep and self.event_generator.event_happened():
-                payload = {"messages": "DUMMY"}
-                header = {"destination": "00000"}
-                self.action.executable, self.action.args = self.lora.generate_packet, [time, payload, header]
-
-        if self.action.executable == self.lora.generate_packet and interrupt == Hardware.EVENTS.ClassA.GENERATE_PACKET:
-            self.action.executable, self.action.args = self.lora.transmit_packet, []
-
-        if self.receiving_windows_enabled:
-            if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END:
-                self.action.executable, self.action.args = self.receive_delay_1, []
+    def timed_actions(self) -> tuple:
+        return (self.lora.sleep_delay, self.receive_delay_1, self.receive_delay_2, self.contention_window_delay,
+                self.rx_1, self.rx_2)
 
-            if self.action.executable == self.receive_delay_1 and interrupt == Hardware.EVENTS.ClassA.RX1_DELAY_END:
-                self.action.executable, self.action.args = self.rx_1, [environment]
+    def listening_actions(self) -> tuple:
+        return self.rx_1, self.rx_2
 
-            if self.action.executable == self.rx_1 and interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED:
-                self.action.executable, self.action.args = sleep, []
+    def next_wakeup(self, time: int, traffic: bool = True) -> float:
+        if self.action.executable == sleep:
+            if traffic:
+                return self.event_generator.next_event_time(time)
+            return math.inf if self.joined_to_network else time # Join driver starts the join procedure
+        # A receive window holding packets restarts its timer on every tick, only the air can change it
+        if self.action.executable in (self.rx_1, self.rx_2) and self.lora.counter is None and self.lora.RX_Buffer:
+            return math.inf
+        return super().next_wakeup(time, traffic)
 
-            if self.action.executable == self.rx_1 and (interrupt == Hardware.EVENTS.ClassA.RX1_END or interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED):
-                self.action.executable, self.action.args = self.receive_delay_2, []
-
-            if self.action.executable == self.receive_delay_2 and interrupt == Hardware.EVENTS.ClassA.RX2_DELAY_END:
-                self.action.executable, self.action.args = self.rx_2, [environment]
-
-            if self.action.executable == self.rx_2 and (interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED or
-                                                        interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED or
-                                                        interrupt == Hardware.EVENTS.ClassA.RX2_END):
-                self.action.executable, self.action.args = sleep, []
-        else:
-            if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END:
-                self.action.executable, self.action.args = sleep, []
+    def protocol_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
+                        environment: Physics.Environment.Environment):
+        fsm = PROTOCOL_FSM if self.receiving_windows_enabled else PROTOCOL_FSM_NO_WINDOWS
+        fsm.dispatch(self, interrupt, time, environment)
 
     def join_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
                         environment: Physics.Environment.Environment):
-
-        if self.action.executable == sleep and not self.joined_to_network:
-            self.action.executable, self.action.args = self.lora.sleep_delay, [Utils.Computations.spaced_delay_from_id(self.lora.ID)]
-
-        # Send Join Request - 18 bytes
-        if self.action.executable == self.lora.sleep_delay and interrupt == Hardware.EVENTS.ClassA.DELAY_END:
-            self.action.executable, self.action.args = self.join_packet_generation, [time]
-
-        if self.action.executable == self.join_packet_generation and interrupt == Hardware.EVENTS.ClassA.GENERATE_PACKET:
-            self.action.executable, self.action.args = self.lora.transmit_packet, []
-
-        # Wait for 5 sec and start receiving
-        if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END:
-            self.action.executable, self.action.args = self.receive_delay_1, []
-
-        if self.action.executable == self.receive_delay_1 and interrupt == Hardware.EVENTS.ClassA.RX1_DELAY_END:
-            self.action.executable, self.action.args = self.rx_1, [environment]
-
-        # RECEIVING AT RX1 THE JOIN ACCEPT
-        if self.action.executable == self.rx_1 and interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED:
-            self.action.executable, self.action.args = self.decode_join_accept, []
-
-        # If not received wait 1 sec
-        if self.action.executable == self.rx_1 and (
-                interrupt == Hardware.EVENTS.ClassA.RX1_END or interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED):
-            self.action.executable, self.action.args = self.receive_delay_2, []
-            self.lora.clear_receiver_from_interrupted_packets()
-
-        if self.action.executable == self.receive_delay_2 and interrupt == Hardware.EVENTS.ClassA.RX2_DELAY_END:
-            self.action.executable, self.action.args = self.rx_2, [environment]
-
-        # CHECK FOR RECEIVED PACKETS AFTER RX2
-        if self.action.executable == self.rx_2 and (interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED or
-                                                    interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED or
-                                                    interrupt == Hardware.EVENTS.ClassA.RX2_END):
-            self.action.executable, self.action.args = self.decode_join_accept, []
-
-        # If received add gateway
-        # Change sf according to gateways suggestions
-        if self.action.executable == self.decode_join_accept and interrupt == Hardware.EVENTS.ClassA.JOIN_ACCEPT_SUCCESS:
-            self.action.executable, self.action.args = sleep, []
-        elif self.action.executable == self.decode_join_accept and interrupt == Hardware.EVENTS.ClassA.JOIN_ACCEPT_FAILED:
-            self.action.executable, self.action.args = self.contention_window_delay, []
-            self.lora.clear_receiver_from_interrupted_packets()
-
-        # Again after contention window
-        if self.action.executable == self.contention_window_delay and interrupt == Hardware.EVENTS.ClassA.CONTENTION_WINDOW_END:
-            self.action.executable, self.action.args = self.join_packet_generation, [time]
+        JOIN_FSM.dispatch(self, interrupt, time, environment)
+
+
+def _traffic_arrival(node, time):
+    return node.event_generator.event_happened(time)
+
+def _not_joined(node, time):
+    return not node.joined_to_network
+
+def _clear_receiver(node):
+    node.lora.clear_receiver_from_interrupted_packets()
+
+
+PROTOCOL_FSM = StateMachine({
+    **on(S.SLEEP, ANY, Transition(S.GENERATE_PACKET, guard=_traffic_arrival)),
+    **on(S.GENERATE_PACKET, E.GENERATE_PACKET, Transition(S.TRANSMIT_PACKET)),
+    **on(S.TRANSMIT_PACKET, E.TRANSMISSION_END, Transition(S.RECEIVE_DELAY_1)),
+    **on(S.RECEIVE_DELAY_1, E.RX1_DELAY_END, Transition(S.RX_1)),
+    **on(S.RX_1, E.PACKET_DECODED, Transition(S.SLEEP)),
+    **on(S.RX_1, (E.RX1_END, E.PACKET_NON_DECODED), Transition(S.RECEIVE_DELAY_2)),
+    **on(S.RECEIVE_DELAY_2, E.RX2_DELAY_END, Transition(S.RX_2)),
+    **on(S.RX_2, (E.PACKET_DECODED, E.PACKET_NON_DECODED, E.RX2_END), Transition(S.SLEEP)),
+})
+
+# Without receiving windows
+PROTOCOL_FSM_NO_WINDOWS = StateMachine({
+    **on(S.SLEEP, ANY, Transition(S.GENERATE_PACKET, guard=_traffic_arrival)),
+    **on(S.GENERATE_PACKET, E.GENERATE_PACKET, Transition(S.TRANSMIT_PACKET)),
+    **on(S.TRANSMIT_PACKET, E.TRANSMISSION_END, Transition(S.SLEEP)),
+})
+
+JOIN_FSM = StateMachine({
+    **on(S.SLEEP, ANY, Transition(S.JOIN_DELAY, guard=_not_joined)),
+    # Send Join Request - 18 bytes
+    **on(S.JOIN_DELAY, E.DELAY_END, Transition(S.JOIN_PACKET_GENERATION)),
+    **on(S.JOIN_PACKET_GENERATION, E.GENERATE_PACKET, Transition(S.TRANSMIT_PACKET)),
+    # Wait for 5 sec and start receiving
+    **on(S.TRANSMIT_PACKET, E.TRANSMISSION_END, Transition(S.RECEIVE_DELAY_1)),
+    **on(S.RECEIVE_DELAY_1, E.RX1_DELAY_END, Transition(S.RX_1)),
+    # RECEIVING AT RX1 THE JOIN ACCEPT
+    **on(S.RX_1, E.PACKET_DECODED, Transition(S.DECODE_JOIN_ACCEPT)),
+    # If not received wait 1 sec
+    **on(S.RX_1, (E.RX1_END, E.PACKET_NON_DECODED), Transition(S.RECEIVE_DELAY_2, effect=_clear_receiver)),
+    **on(S.RECEIVE_DELAY_2, E.RX2_DELAY_END, Transition(S.RX_2)),
+    # CHECK FOR RECEIVED PACKETS AFTER RX2
+    **on(S.RX_2, (E.PACKET_DECODED, E.PACKET_NON_DECODED, E.RX2_END), Transition(S.DECODE_JOIN_ACCEPT)),
+    # If received add gateway
+    # Change sf according to gateways suggestions
+    **on(S.DECODE_JOIN_ACCEPT, E.JOIN_ACCEPT_SUCCESS, Transition(S.SLEEP)),
+    **on(S.DECODE_JOIN_ACCEPT, E.JOIN_ACCEPT_FAILED, Transition(S.CONTENTION_WINDOW_DELAY, effect=_clear_receiver)),
+    # Again after contention window
+    **on(S.CONTENTION_WINDOW_DELAY, E.CONTENTION_WINDOW_END, Transition(S.JOIN_PACKET_GENERATION)),
+})
@@ -1,19 +1,32 @@
 import Hardware.EVENTS
 import Physics.Environment
+from Hardware.EVENTS import ClassA as E
+from Hardware.STATES import ClassA as S
+from Utils.StateMachine import ANY, StateMachine, Transition, on
 import Utils.TrafficModel
 import Wireless.signals
+from Hardware.GatewayReceiver import GatewayReceiver
 from Hardware.LoRaModule import sleep
 from Hardware.SensorNode import SensorNode
 
-MAXIMUM_PARALLEL_PACKETS = 8
+MAXIMUM_PARALLEL_PACKETS = 8 # Demodulator paths
 
 class LoRaWANGateway(SensorNode):
 
     def __init__(self, node_id: str, wurx_json: str, lora_json: str, position: Wireless.signals.Location, environment, NetworkServer):
         super().__init__(node_id, wurx_json, lora_json, position)
-        self.action.executable, self.action.args = self.multiple_input, [environment]
+        self.receiver = GatewayReceiver(self.lora, MAXIMUM_PARALLEL_PACKETS)
+        environment.lora_listeners.append(self.frame_started)
+        self.enter(S.MULTIPLE_INPUT, 0, environment)
         self.NetworkServer = NetworkServer
 
+    STATE_ACTIONS = {
+        S.MULTIPLE_INPUT: lambda gateway, time, environment: (gateway.multiple_input, [environment]),
+        S.TRANSMIT_DELAY_1: lambda gateway, time, environment: (gateway.transmit_delay_1, []),
+        S.GENERATE_ACCEPT_PACKET: lambda gateway, time, environment: (gateway.generate_accept_packet, [time]),
+        S.TRANSMIT_PACKET: lambda gateway, time, environment: (gateway.lora.transmit_packet, []),
+    }
+
     def transmit_delay_1(self):
         # print("RX DELAY 1")
         # Standard 1 s
@@ -25,32 +38,31 @@ class LoRaWANGateway(SensorNode):
         else:
             return None, None
 
-    def multiple_input(self, environment):
-        # FIND OCCUPIED RESOURCES SF/CHANNEL
-        sf_channel = [(i, j) for i, row  in enumerate(environment.lora_packet_over_air) for j, cell in enumerate(row) if cell] # non-empty test
+    def frame_started(self, signal, environment):
+        # Preambles are only detected while receiving
+        if self.action.executable == self.multiple_input:
+            self.receiver.frame_started(signal, environment)
 
-        for i in range(MAXIMUM_PARALLEL_PACKETS):
-            if i == len(sf_channel):
-                break
+    def multiple_input(self, environment):
+        # Frames were locked on the demodulator paths as they started, collect the ended ones
+        for signal, rx_power in self.receiver.listen(environment.time):
+            # Answer on the channel & SF of the last decoded frame
+            self.lora.Channel = signal.channel
+            self.lora.SF = signal.sf
+            self.lora.RSSI = self.lora.rssi_by_sf[self.lora.SF]
+            self.lora.accept_frame(signal, rx_power, environment.time)
 
-            self.lora.Channel = sf_channel[i][0] + 1
-            self.lora.SF = sf_channel[i][1] + 7
-            self.lora.RSSI = self.lora.RSSIs[str(self.lora.SF)]
+        return None, None
 
-            self.lora.receive_packets_partial(environment)
+    def timed_actions(self) -> tuple:
+        return (self.transmit_delay_1,)
 
-        return None, None
+    def listening_actions(self) -> tuple:
+        return (self.multiple_input,)
 
     def suggest_sf(self, rx_power_dbm):
         # Ordered from highest to lowest spreading factor
-        sf_thresholds = {
-            12: self.lora.RSSIs["12"],
-            11: self.lora.RSSIs["11"],
-            10: self.lora.RSSIs["10"],
-            9: self.lora.RSSIs["9"],
-            8: self.lora.RSSIs["8"],
-            7: self.lora.RSSIs["7"]
-        }
+        sf_thresholds = self.lora.rssi_by_sf
         for sf, sensitivity in sorted(sf_thresholds.items()):
             if rx_power_dbm >= sensitivity:
                 return sf
@@ -92,15 +104,16 @@ class LoRaWANGateway(SensorNode):
     # Join Accept -> 12 + 16 bytes
     def join_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
                         environment: Physics.Environment.Environment):
+        JOIN_FSM.dispatch(self, interrupt, time, environment)
 
-        if self.action.executable == self.multiple_input and self.lora.TX_Buffer:
-            self.action.executable, self.action.args = self.transmit_delay_1, []
 
-        if self.action.executable == self.transmit_delay_1 and interrupt == Hardware.EVENTS.ClassA.RX1_DELAY_END:
-            self.action.executable, self.action.args = self.generate_accept_packet, [time]
+def _join_request_received(gateway, time):
+    return bool(gateway.lora.TX_Buffer)
 
-        if self.action.executable == self.generate_accept_packet and interrupt == Hardware.EVENTS.ClassA.GENERATE_PACKET:
-            self.action.executable, self.action.args = self.lora.transmit_packet, []
 
-        if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END:
-            self.action.executable, self.action.args = self.multiple_input, [environment]
+JOIN_FSM = StateMachine({
+    **on(S.MULTIPLE_INPUT, ANY, Transition(S.TRANSMIT_DELAY_1, guard=_join_request_received)),
+    **on(S.TRANSMIT_DELAY_1, E.RX1_DELAY_END, Transition(S.GENERATE_ACCEPT_PACKET)),
+    **on(S.GENERATE_ACCEPT_PACKET, E.GENERATE_PACKET, Transition(S.TRANSMIT_PACKET)),
+    **on(S.TRANSMIT_PACKET, E.TRANSMISSION_END, Transition(S.MULTIPLE_INPUT)),
+})
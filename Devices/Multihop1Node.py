@@ -1,5 +1,8 @@
 import Hardware.EVENTS
 import Physics.Environment
+from Hardware.EVENTS import ClassA as E
+from Hardware.STATES import ClassA as S
+from Utils.StateMachine import ANY, StateMachine, Transition, on
 import Utils.TrafficModel
 import Utils.Computations as cmp
 import Wireless.signals
@@ -67,17 +70,10 @@ class Multihop1Node(LoRaWANNode):
     def sensing_mechanism(self, environment):
         signal_timer, _ = self.lora.sleep_delay(self.sensing_counter)  # Used as timer
 
-        packets_in_channel_sf = environment.lora_packet_over_air[self.lora.Channel - 1][self.lora.SF - 7].copy()  # To have 1st indexed as 0
-        for i in range(len(packets_in_channel_sf) - 1, -1, -1):
-            rx_power = Utils.Computations.calculate_received_power(Utils.Computations.distance(
-                packets_in_channel_sf[i].signal.source_location, self.location),
-                packets_in_channel_sf[i].signal.tx_power)
+        frames = environment.lora_bucket(self.lora.Channel - 1, self.lora.SF - 7)  # To have 1st indexed as 0
+        rx_power = environment.lora_links.received_power(frames["source"], self.lora.index)
 
-            if rx_power < self.lora.RSSI:
-                del packets_in_channel_sf[i]
-                continue
-
-        if len(packets_in_channel_sf) > 0:
+        if (rx_power >= self.lora.RSSI).any():
             self.sensing_counter = None
             return Hardware.EVENTS.ClassA.CHANNEL_ACTIVITY_DETECTED, None
         elif signal_timer == Hardware.EVENTS.ClassA.DELAY_END:
@@ -125,102 +121,93 @@ class Multihop1Node(LoRaWANNode):
         return Hardware.EVENTS.ClassA.JOIN_ACCEPT_FAILED, None
 
 
+    STATE_ACTIONS = {
+        **LoRaWANNode.STATE_ACTIONS,
+        S.ACCEPT_DELAY: lambda node, time, environment: (node.lora.sleep_delay, [10]),
+        S.LISTEN_DELAY: lambda node, time, environment: (node.lora.sleep_delay, [100]), # Brief 100ms sleep before restarting
+        S.WAITING_FOR_JOIN_REQUESTS: lambda node, time, environment: (node.waiting_for_join_requests, [environment, time]),
+        S.SENSING: lambda node, time, environment: (node.sensing_mechanism, [environment]),
+    }
+
+    def timed_actions(self) -> tuple:
+        return super().timed_actions() + (self.waiting_for_join_requests, self.sensing_mechanism)
+
+    def listening_actions(self) -> tuple:
+        return super().listening_actions() + (self.waiting_for_join_requests, self.sensing_mechanism)
+
     def protocol_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
                         environment: Physics.Environment.Environment):
         pass
 
     def join_driver(self, interrupt: Hardware.EVENTS.ClassA, time: int,
                         environment: Physics.Environment.Environment):
-
-        """
-                BEFORE BEING ASSIGNED TO A NODE OR GATEWAY
-        """
-
-        if self.action.executable == sleep and not self.joined_to_network:
-            self.action.executable, self.action.args = self.lora.sleep_delay, [Utils.Computations.spaced_delay_from_id(self.lora.ID)]
-
-        # Send Join Request
-        if self.action.executable == self.lora.sleep_delay and interrupt == Hardware.EVENTS.ClassA.DELAY_END and not self.joined_to_network:
-            self.action.executable, self.action.args = self.join_packet_generation, [time]
-
-        if self.action.executable == self.join_packet_generation and interrupt == Hardware.EVENTS.ClassA.GENERATE_PACKET:
-            self.action.executable, self.action.args = self.lora.transmit_packet, []
-
-        # Start listening and receiving - timeouts in one minute
-        if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END:
-            self.action.executable, self.action.args = self.receive_delay_1, []
-
-        if self.action.executable == self.receive_delay_1 and interrupt == Hardware.EVENTS.ClassA.RX1_DELAY_END:
-            self.action.executable, self.action.args = self.rx_1, [environment]
-
-        # RECEIVING AT RX1 THE JOIN ACCEPT
-        if self.action.executable == self.rx_1 and interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED:
-            self.action.executable, self.action.args = self.decode_join_accept, []
-
-        # If received packet but not a join accept one
-        if self.action.executable == self.decode_join_accept and interrupt == Hardware.EVENTS.ClassA.JOIN_ACCEPT_FAILED:
-            self.action.executable, self.action.args = self.contention_window_delay, []
-            self.lora.clear_receiver_from_interrupted_packets()
-            self.lora.TX_Buffer = [] # CLEAR DECODED PACKETS
-
-        # If not received in RX1 or packet corrupted, wait and open RX2
-        if self.action.executable == self.rx_1 and (interrupt == Hardware.EVENTS.ClassA.RX1_END or interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED):
-            self.action.executable, self.action.args = self.receive_delay_2, []
-            self.lora.clear_receiver_from_interrupted_packets()
-
-        # Open RX2 window
-        if self.action.executable == self.receive_delay_2 and interrupt == Hardware.EVENTS.ClassA.RX2_DELAY_END:
-            self.action.executable, self.action.args = self.rx_2, [environment]
-
-        # Check for JOIN_ACCEPT in RX2 window
-        if self.action.executable == self.rx_2 and interrupt == Hardware.EVENTS.ClassA.PACKET_DECODED:
-            self.action.executable, self.action.args = self.decode_join_accept, []
-
-        # If RX2 also fails, enter contention window before retry
-        if self.action.executable == self.rx_2 and (interrupt == Hardware.EVENTS.ClassA.RX2_END or interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED):
-            self.action.executable, self.action.args = self.contention_window_delay, []
-            self.lora.clear_receiver_from_interrupted_packets()
-
-        # Again after contention window
-        # Goes again to join request
-        if self.action.executable == self.contention_window_delay and interrupt == Hardware.EVENTS.ClassA.CONTENTION_WINDOW_END:
-            self.action.executable, self.action.args = self.join_packet_generation, [time]
-
-        """
-                AFTER BEING ASSIGNED TO A NODE OR GATEWAY
-        """
-
-        # If node has received successfully a join accept
-        # Wait 10 ms and start idle listening
-        if self.action.executable == self.decode_join_accept and interrupt == Hardware.EVENTS.ClassA.JOIN_ACCEPT_SUCCESS:
-            self.action.executable, self.action.args = self.lora.sleep_delay, [10]
-
-        # Open Receiver for 4 mins timeout limit
-        if self.action.executable == self.lora.sleep_delay and interrupt == Hardware.EVENTS.ClassA.DELAY_END and self.joined_to_network:
-            self.action.executable, self.action.args = self.waiting_for_join_requests, [environment, time]
-
-        # If it has a failure in decoding, it means that a request will pr1obably re-transmitted. SO it remain opened
-        if self.action.executable == self.waiting_for_join_requests and interrupt == Hardware.EVENTS.ClassA.PACKET_NON_DECODED:
-            self.action.executable, self.action.args = self.waiting_for_join_requests, [environment, time]
-
-        # A join request received, so, a join response will be sent after sensing
-        if self.action.executable == self.waiting_for_join_requests and interrupt == Hardware.EVENTS.ClassA.GENERATE_PACKET:
-            self.sensing_counter = random.randint(0, 100)
-            self.action.executable, self.action.args = self.sensing_mechanism, [environment]
-
-        # If channel has activity, wait and retry sensing
-        if self.action.executable == self.sensing_mechanism and interrupt == Hardware.EVENTS.ClassA.CHANNEL_ACTIVITY_DETECTED:
-            self.sensing_counter = random.randint(50, 150)  # Random backoff before retrying
-            self.action.executable, self.action.args = self.sensing_mechanism, [environment]
-
-        # If channel is clear, so a join accept could be sent
-        if self.action.executable == self.sensing_mechanism and interrupt == Hardware.EVENTS.ClassA.CHANNEL_CLEAR:
-            self.action.executable, self.action.args = self.lora.transmit_packet, []
-
-        # After transmitting JOIN_ACCEPT, return to waiting for more join requests
-        if self.action.executable == self.lora.transmit_packet and interrupt == Hardware.EVENTS.ClassA.TRANSMISSION_END and self.joined_to_network:
-            self.action.executable, self.action.args = self.waiting_for_join_requests, [environment, time]
-
-        # Timeout while waiting for join requests - restart waiting after brief sleep
-        if self.action.executable == self.waiting_for_join_requests and interrupt == Hardware.EVENTS.ClassA.DELAY_END:
-            self.action.executable, self.action.args = self.lora.sleep_delay, [100]  # Brief 100ms sleep before restarting
+        JOIN_FSM.dispatch(self, interrupt, time, environment)
+
+
+def _not_joined(node, time):
+    return not node.joined_to_network
+
+def _joined(node, time):
+    return node.joined_to_network
+
+def _clear_receiver(node):
+    node.lora.clear_receiver_from_interrupted_packets()
+
+def _clear_receiver_and_decoded(node):
+    node.lora.clear_receiver_from_interrupted_packets()
+    node.lora.TX_Buffer = [] # CLEAR DECODED PACKETS
+
+def _sensing_delay(node):
+    node.sensing_counter = random.randint(0, 100)
+
+def _sensing_backoff(node):
+    node.sensing_counter = random.randint(50, 150)  # Random backoff before retrying
+
+
+JOIN_FSM = StateMachine({
+    # BEFORE BEING ASSIGNED TO A NODE OR GATEWAY
+    **on(S.SLEEP, ANY, Transition(S.JOIN_DELAY, guard=_not_joined)),
+    # Send Join Request
+    **on(S.JOIN_DELAY, E.DELAY_END, Transition(S.JOIN_PACKET_GENERATION)),
+    **on(S.JOIN_PACKET_GENERATION, E.GENERATE_PACKET, Transition(S.TRANSMIT_PACKET)),
+    # Start listening and receiving - timeouts in one minute
+    # The first transition is always taken, also after a JOIN_ACCEPT has been sent
+    **on(S.TRANSMIT_PACKET, E.TRANSMISSION_END, Transition(S.RECEIVE_DELAY_1),
+         Transition(S.WAITING_FOR_JOIN_REQUESTS, guard=_joined)),
+    **on(S.RECEIVE_DELAY_1, E.RX1_DELAY_END, Transition(S.RX_1)),
+    # RECEIVING AT RX1 THE JOIN ACCEPT
+    **on(S.RX_1, E.PACKET_DECODED, Transition(S.DECODE_JOIN_ACCEPT)),
+    # If received packet but not a join accept one
+    **on(S.DECODE_JOIN_ACCEPT, E.JOIN_ACCEPT_FAILED,
+         Transition(S.CONTENTION_WINDOW_DELAY, effect=_clear_receiver_and_decoded)),
+    # If not received in RX1 or packet corrupted, wait and open RX2
+    **on(S.RX_1, (E.RX1_END, E.PACKET_NON_DECODED), Transition(S.RECEIVE_DELAY_2, effect=_clear_receiver)),
+    # Open RX2 window
+    **on(S.RECEIVE_DELAY_2, E.RX2_DELAY_END, Transition(S.RX_2)),
+    # Check for JOIN_ACCEPT in RX2 window
+    **on(S.RX_2, E.PACKET_DECODED, Transition(S.DECODE_JOIN_ACCEPT)),
+    # If RX2 also fails, enter contention window before retry
+    **on(S.RX_2, (E.RX2_END, E.PACKET_NON_DECODED), Transition(S.CONTENTION_WINDOW_DELAY, effect=_clear_receiver)),
+    # Again after contention window
+    # Goes again to join request
+    **on(S.CONTENTION_WINDOW_DELAY, E.CONTENTION_WINDOW_END, Transition(S.JOIN_PACKET_GENERATION)),
+
+    # AFTER BEING ASSIGNED TO A NODE OR GATEWAY
+    # If node has received successfully a join accept
+    # Wait 10 ms and start idle listening
+    **on(S.DECODE_JOIN_ACCEPT, E.JOIN_ACCEPT_SUCCESS, Transition(S.ACCEPT_DELAY)),
+    # Open Receiver for 4 mins timeout limit
+    # Entering waiting_for_join_requests on DELAY_END also takes its own DELAY_END transition
+    # below in the same call, so the node goes straight back to the brief sleep
+    **on((S.ACCEPT_DELAY, S.LISTEN_DELAY), E.DELAY_END, Transition(S.LISTEN_DELAY)),
+    # If it has a failure in decoding, it means that a request will pr1obably re-transmitted. SO it remain opened
+    **on(S.WAITING_FOR_JOIN_REQUESTS, E.PACKET_NON_DECODED, Transition(S.WAITING_FOR_JOIN_REQUESTS)),
+    # A join request received, so, a join response will be sent after sensing
+    **on(S.WAITING_FOR_JOIN_REQUESTS, E.GENERATE_PACKET, Transition(S.SENSING, effect=_sensing_delay)),
+    # If channel has activity, wait and retry sensing
+    **on(S.SENSING, E.CHANNEL_ACTIVITY_DETECTED, Transition(S.SENSING, effect=_sensing_backoff)),
+    # If channel is clear, so a join accept could be sent
+    **on(S.SENSING, E.CHANNEL_CLEAR, Transition(S.TRANSMIT_PACKET)),
+    # Timeout while waiting for join requests - restart waiting after brief sleep
+    **on(S.WAITING_FOR_JOIN_REQUESTS, E.DELAY_END, Transition(S.LISTEN_DELAY)),
+})
@@ -0,0 +1,229 @@
+"""
+Experiments from scenario files
+===============================
+A scenario file (JSON) fixes the parameters of a sweep; every combination
+of the sweep axes and seeds is one run (comments are not part of the file)::
+
+    {
+      "name": "lorawan-aloha",
+      "output_dir": "Results/lorawan-aloha",      # default Results/<name>
+      "topology": "Topology/topology.json",
+      "device_type": "LoRaWANNode", "gateway_type": "LoRaWANGateway",
+      "duration": 500000,                          # simulated ms of the run phase
+      "seeds": 3,                                  # or a list of seeds
+      "sweep": {"generation_prob": [0.0001, 0.0002, 0.0004]}
+    }
+
+Any other parameter of the runs (lora_config, wur_config, engine,
+traffic_model, traffic_parameters, interference_model, checkpoint_dir,
+join_seed, generation_prob, ...) can be fixed at the top level or be a
+sweep axis; with checkpoint_dir and join_seed every run restores one join.
+Run it with::
+
+    python Experiment.py Scenarios/lorawan_aloha.json [--processes 8] [--dry-run]
+
+Each finished run writes <output_dir>/runs/<run id>.json, the run id being
+a hash of its parameters, and runs whose file exists are skipped. An
+interrupted sweep therefore continues where it stopped when started again.
+At the end, summary.csv holds one line per run. With "packet_log": "npz"
+(or "parquet") every run also writes its per-packet event log to
+<output_dir>/logs/<run id>.npz, see Metrics.PacketLog. With
+"results_cache": "Cache" runs already simulated by any scenario or sweep
+(same inputs, seed and code) are read from that cache, see
+Utils.ResultsCache.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+__all__ = ["load_scenario", "expand", "run_scenario", "DEVICE_TYPES"]
+
+DEVICE_TYPES = {
+    "LoRaWANNode": "Devices.LoRaWANClassANode",
+    "Multihop1Node": "Devices.Multihop1Node",
+    "LoRaWANGateway": "Devices.LoRaWANGateway",
+    "MultihopGateway": "Devices.MultihopGateway",
+}
+
+# Scenario names -> Sweep.simulate keyword arguments
+RENAMED = {"topology": "devices_config", "duration": "simulation_time"}
+RUN_PARAMETERS = {"simulation_time", "generation_prob", "devices_config", "lora_config", "wur_config",
+                  "device_type", "gateway_type", "engine", "traffic_model", "traffic_parameters", "checkpoint_dir",
+                  "join_seed", "interference_model", "interference_parameters"}
+SCENARIO_KEYS = {"name", "output_dir", "seeds", "sweep", "processes", "packet_log", "results_cache"}
+
+
+def load_scenario(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        scenario = json.load(f)
+    scenario.setdefault("name", Path(path).stem)
+    scenario.setdefault("output_dir", str(Path("Results") / scenario["name"]))
+    return scenario
+
+
+def expand(scenario: dict) -> list:
+    """Parameters of every run: the fixed ones, one value per sweep axis and a seed."""
+    fixed = {RENAMED.get(key, key): value for key, value in scenario.items() if key not in SCENARIO_KEYS}
+    axes = {RENAMED.get(key, key): values for key, values in scenario.get("sweep", {}).items()}
+    unknown = (set(fixed) | set(axes)) - RUN_PARAMETERS
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters {sorted(unknown)}")
+    for key in ("simulation_time", "generation_prob"):
+        if key not in fixed and key not in axes:
+            raise ValueError(f"Scenario needs {key!r}, fixed or as a sweep axis")
+
+    seeds = scenario.get("seeds", 1)
+    seeds = list(range(seeds)) if isinstance(seeds, int) else list(seeds)
+
+    runs = []
+    for values in itertools.product(*axes.values()):
+        for seed in seeds:
+            runs.append({**fixed, **dict(zip(axes, values)), "seed": seed})
+    return runs
+
+
+def run_id(parameters: dict) -> str:
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _device_type(name: str):
+    if name not in DEVICE_TYPES:
+        raise ValueError(f"Unknown device class {name!r}, expected one of {sorted(DEVICE_TYPES)}")
+    module = __import__(DEVICE_TYPES[name], fromlist=[name])
+    return getattr(module, name)
+
+
+def _seed_and_kwargs(parameters: dict) -> tuple:
+    """(seed, Sweep.simulate keyword arguments) of a run."""
+    kwargs = dict(parameters)
+    seed = kwargs.pop("seed")
+    for key in ("device_type", "gateway_type"):
+        if key in kwargs:
+            kwargs[key] = _device_type(kwargs[key])
+    return seed, kwargs
+
+
+def run_one(parameters: dict, packet_log: str | None = None, results_cache: str | None = None) -> dict:
+    """Join and run one point (simulator output suppressed); returns its results."""
+    from Sweep import simulate
+
+    seed, kwargs = _seed_and_kwargs(parameters)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        sim = simulate(seed, packet_log=packet_log, results_cache=results_cache, **kwargs)
+    metrics = sim.metrics
+    generated, delivered = sim.end_of_simulation()
+    return {
+        "generated": generated,
+        "delivered": delivered,
+        "pdr": metrics.pdr(),
+        "mean_latency_ms": None if not metrics.delivered else metrics.mean_latency(),
+        "interfered": metrics.interfered,
+        "no_path": metrics.no_path,
+        "wall_s": round(time.perf_counter() - start, 3),
+        "cached": sim.cached_results is not None,
+    }
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.chmod(temporary, 0o644) # mkstemp creates it private
+    os.replace(temporary, path)
+
+
+def run_scenario(scenario: dict, processes: int | None = None, dry_run: bool = False) -> list:
+    """Run the missing points of a scenario; returns every run record, finished before or now."""
+    output = Path(scenario["output_dir"])
+    runs_dir = output / "runs"
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    log_format = scenario.get("packet_log")
+    results_cache = scenario.get("results_cache")
+    if log_format not in (None, "npz", "parquet"):
+        raise ValueError(f"Unknown packet_log format {log_format!r}, expected 'npz' or 'parquet'")
+    _write_atomic(output / "scenario.json", json.dumps(scenario, indent=2))
+
+    runs = expand(scenario)
+    pending = [(run_id(parameters), parameters) for parameters in runs
+               if not (runs_dir / f"{run_id(parameters)}.json").exists()]
+    print(f"{scenario['name']}: {len(runs)} runs, {len(runs) - len(pending)} done, {len(pending)} to run")
+    if dry_run:
+        return []
+
+    def packet_log(identifier: str) -> str | None:
+        return str(output / "logs" / f"{identifier}.{log_format}") if log_format else None
+
+    def save(identifier: str, parameters: dict, results: dict, done: int) -> None:
+        record = {"id": identifier, "parameters": parameters, "results": results}
+        _write_atomic(runs_dir / f"{identifier}.json", json.dumps(record, separators=(",", ":")))
+        print(f"[{done}/{len(pending)}] {identifier} seed={parameters['seed']} "
+              f"generated={results['generated']} delivered={results['delivered']} ({results['wall_s']} s)")
+
+    if processes == 1:
+        for done, (identifier, parameters) in enumerate(pending, 1):
+            save(identifier, parameters, run_one(parameters, packet_log(identifier), results_cache), done)
+    elif pending:
+        from Sweep import join_once
+        cache = None if log_format else results_cache # Logged runs are simulated anyway
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            join_once([(seed, {**kwargs, "results_cache": cache})
+                       for seed, kwargs in (_seed_and_kwargs(parameters) for _, parameters in pending)])
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(run_one, parameters, packet_log(identifier), results_cache):
+                           (identifier, parameters)
+                       for identifier, parameters in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                save(*futures[future], future.result(), done)
+
+    records = [json.loads((runs_dir / f"{run_id(parameters)}.json").read_text(encoding="utf-8"))
+               for parameters in runs]
+    _write_summary(output / "summary.csv", records)
+    return records
+
+
+def _write_summary(path: Path, records: list) -> None:
+    parameters = sorted({key for record in records for key in record["parameters"]})
+    results = sorted({key for record in records for key in record["results"]})
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", *parameters, *results])
+        for record in records:
+            writer.writerow([record["id"], *(_cell(record["parameters"].get(key)) for key in parameters),
+                             *(record["results"].get(key) for key in results)])
+
+
+def _cell(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the sweep of a scenario file, skipping finished runs")
+    parser.add_argument("scenario", help="scenario file (JSON)")
+    parser.add_argument("--processes", type=int, help="worker processes, default the scenario's or all cores")
+    parser.add_argument("--output-dir", help="overrides the scenario's output_dir")
+    parser.add_argument("--dry-run", action="store_true", help="only count the runs still to do")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    if args.output_dir:
+        scenario["output_dir"] = args.output_dir
+    processes = args.processes if args.processes is not None else scenario.get("processes")
+    run_scenario(scenario, processes, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class _Path:
+    """One demodulator, locked on a frame from its preamble to its last tick."""
+    __slots__ = ("signal", "rx_power", "clean")
+
+    def __init__(self, signal, rx_power: float, clean: bool):
+        self.signal = signal
+        self.rx_power = rx_power
+        self.clean = clean      # captured on every tick so far
+
+
+class GatewayReceiver:
+    """
+    Multi-channel, multi-SF receiver of a gateway with a fixed number of
+    demodulator paths.
+
+    The environment notifies the receiver of every new frame. A frame heard
+    above the sensitivity of its SF takes a free path, or is lost if all
+    paths are busy, and holds the path until its last tick. A locked frame is
+    decoded if the interference model of the environment found it decodable
+    whenever a frame started during it (interference only grows when frames
+    start), and the receiver listened on every tick of it. The work is per
+    new frame plus per locked path and tick.
+    """
+
+    def __init__(self, lora, paths: int):
+        self.lora = lora                # LoRaModule of the gateway: index, sensitivities, decoding
+        self.paths = paths
+        self.sensitivity = np.array([lora.rssi_by_sf[sf] for sf in range(7, 13)]) # dBm by SF index
+        self.locked: dict = {}          # frame id -> _Path
+        self.last_tick: int | None = None # last tick the receiver listened
+        self.lost_no_path: int = 0      # heard frames dropped because every path was busy
+
+    def frame_started(self, signal, environment) -> None:
+        """Environment notification: signal went on air on this tick."""
+        model = environment.interference
+        frames = model.frames(environment, signal.channel - 1, signal.sf - 7)
+        rx_power = environment.lora_links.received_power(frames["source"], self.lora.index)
+        sensitivity = self.sensitivity[frames["sf"]]
+        new = np.flatnonzero(frames["id"] == signal.frame_id)[0]
+        heard = rx_power[new] >= sensitivity[new]
+        if not heard and not (self.locked and model.unheard_frames_interfere):
+            return # Below sensitivity, neither received nor interfering
+
+        decodable = model.decodable(frames, rx_power, sensitivity)
+        # The new frame may take over the ones it overlaps
+        if self.locked:
+            lost = set(frames["id"][~decodable].tolist())
+            for frame_id, path in self.locked.items():
+                if frame_id in lost:
+                    path.clean = False
+        if not heard:
+            return
+
+        power = float(rx_power[new])
+        if len(self.locked) >= self.paths:
+            self.lost_no_path += 1
+            if self.lora.metrics is not None:
+                self.lora.metrics.frame_lost(signal, power, environment.time, self.lora.index, no_path=True)
+            return
+        self.locked[signal.frame_id] = _Path(signal, power, bool(decodable[new]))
+
+    def listen(self, now: int) -> list:
+        """Listen on tick now; returns the frames decoded on it as (signal, received power)."""
+        if self.last_tick is not None and now != self.last_tick + 1:
+            for path in self.locked.values():
+                if path.signal.start_time < now:
+                    path.clean = False # Deaf for part of the frame, e.g. while transmitting
+        self.last_tick = now
+
+        decoded = []
+        for frame_id in [frame_id for frame_id, path in self.locked.items() if path.signal.end_time <= now]:
+            path = self.locked.pop(frame_id)
+            if path.clean and path.signal.end_time == now:
+                decoded.append((path.signal, path.rx_power))
+            elif self.lora.metrics is not None:
+                self.lora.metrics.frame_lost(path.signal, path.rx_power, now, self.lora.index)
+        return decoded
+
+    def busy_paths(self) -> int:
+        return len(self.locked)
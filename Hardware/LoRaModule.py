@@ -1,15 +1,16 @@
 import copy
-import json
-from collections import defaultdict
-from heapq import nlargest
-from typing import Dict, List
+import itertools
+import math
+import numpy as np
 import Hardware.EVENTS
-from Utils import Computations
+from Utils import Computations, Config
 from Physics.Environment import Environment
 from Wireless.LoRaPacket import LoRaPacket
 from Wireless.signals import LoRaWirelessSignal
 
 class Location:
+    __slots__ = ("x", "y")
+
     def __init__(self,x, y):
         self.x = x
         self.y = y
@@ -20,152 +21,182 @@ def sleep():
     return None, None
 
 
+class _Reception:
+    """Frame a receiver has locked on, for one channel & SF."""
+
+    def __init__(self, signal: LoRaWirelessSignal, rx_power: float):
+        self.signal = signal            # the frame
+        self.rx_power = rx_power
+        self.heard = 0                  # ticks of the frame heard as the captured frame
+
+
 class LoRaModule:
     def __init__(self, id: str, parameters_path: str, position: Location):
         self.ID: str = id
         self.TX_Buffer: list[LoRaPacket] = []
         self.RX_Buffer: list[LoRaPacket] = []
         self.location: Location = position
+        self.index: int | None = None # Row / column in the environment link budget
 
-        parameters: dict
-        with open(parameters_path) as f: parameters = json.load(f)
+        parameters = Config.lora_parameters(parameters_path) # Shared, parsed once
 
-        self.SF: int = parameters["sf"]
-        self.Channel: int = parameters["channel"]
-        self.Bandwidth: int = parameters["bandwidth"]
-        self.PowerTX: float = parameters["PowerTX"]
+        self.SF: int = parameters.sf
+        self.Channel: int = parameters.channel
+        self.Bandwidth: int = parameters.bandwidth
+        self.PowerTX: float = parameters.power_tx
 
-        self.RSSIs = {"7": parameters["RSSI_sf7"],
-                 "8": parameters["RSSI_sf8"],
-                 "9": parameters["RSSI_sf9"],
-                 "10": parameters["RSSI_sf10"],
-                 "11": parameters["RSSI_sf11"],
-                 "12": parameters["RSSI_sf12"]}
+        self.RSSIs = parameters.rssis # Read only, "7" ... "12"
+        self.rssi_by_sf = parameters.rssi_by_sf # Read only, 7 ... 12
 
         # Default
-        self.RSSI: float = self.RSSIs[str(self.SF)]
+        self.RSSI: float = self.rssi_by_sf[self.SF]
         self.counter = None # GENERAL COUNTER
+        self.tx_ticks_left = None # Ticks of the frame being transmitted still to elapse
+
+        # Frame locked per (channel, sf) and capture decision per (channel, sf)
+        self.receptions: dict = {}
+        self._capture_cache: dict = {}
 
         # LOGS
         self.generated_packets: int = 0
-        self.successfully_received_packets = []
+        self.metrics = None # Metrics.Collector.MetricsCollector of the simulation, if any
+        self.packet_ids = itertools.count(1) # Packet numbering, shared by the devices of a simulation
 
     def tick(self):
         if self.counter > 0: self.counter -= 1
 
     def generate_packet(self,generation_time: int, payload: dict, header: dict):
         header["source"] = self.ID # Define the source in header
-        new_packet: LoRaPacket = LoRaPacket(generation_time, payload, header, Computations.toa(Computations.compute_payload_size(payload), self.SF))
-        new_packet.IsFirstPacket = True
+        payload_size = Computations.compute_payload_size(payload)
+        new_packet: LoRaPacket = LoRaPacket(generation_time, payload, header, Computations.toa(payload_size, self.SF),
+                                            next(self.packet_ids))
+        new_packet.payload_size = payload_size
         new_packet.sf = self.SF
         new_packet.channel = self.Channel
         self.TX_Buffer.append(new_packet)
 
         # Statistics
         self.generated_packets += 1
+        if self.metrics is not None:
+            self.metrics.packet_generated(new_packet)
 
         # print("GENERATE PACKET")
         return Hardware.EVENTS.ClassA.GENERATE_PACKET, None
 
     def transmit_packet(self):
         # print("TRANSMIT PACKET")
+        # The frame is over the air as one interval, here we only wait for its end
+        if self.tx_ticks_left is not None:
+            self.tx_ticks_left -= 1
+            if self.tx_ticks_left > 0:
+                return None, None
+            self.tx_ticks_left = None
+            return Hardware.EVENTS.ClassA.TRANSMISSION_END, None
+
         if len(self.TX_Buffer) > 0:
             wireless_lora_signal = LoRaWirelessSignal(self.TX_Buffer.pop(), self)
-            if wireless_lora_signal.lora_packet.segment_counter > 1:
-                copy_wireless_lora_signal = copy.deepcopy(wireless_lora_signal)
-                copy_wireless_lora_signal.lora_packet.segment_counter -= 1
-                copy_wireless_lora_signal.lora_packet.IsFirstPacket = False
-                self.TX_Buffer.append(copy_wireless_lora_signal.lora_packet)
-            else:
+            wireless_lora_signal.time_over_air_required = Computations.toa(wireless_lora_signal.lora_packet.payload_size, self.SF)
+            ticks = Computations.airtime_ticks(wireless_lora_signal.time_over_air_required)
+            if self.metrics is not None:
+                self.metrics.frame_transmitted(self.Channel, self.SF, ticks)
+            if ticks == 1:
                 return Hardware.EVENTS.ClassA.TRANSMISSION_END, wireless_lora_signal
 
-            # Return Packet and Event
-            if wireless_lora_signal.lora_packet.IsFirstPacket:
-                # print("TRANSMIT PACKET")
-                return Hardware.EVENTS.ClassA.TRANSMISSION_START, wireless_lora_signal
-            else:
-                return None, wireless_lora_signal
+            self.tx_ticks_left = ticks - 1
+            # print("TRANSMIT PACKET")
+            return Hardware.EVENTS.ClassA.TRANSMISSION_START, wireless_lora_signal
         return None, None
 
     def clear_receiver_from_interrupted_packets(self):
         # remove / drop every packet that uses *this* node’s channel & SF
-        self.RX_Buffer[:] = [
-            pkt for pkt in self.RX_Buffer
-            if not (pkt.sf == self.SF and pkt.channel == self.Channel)
-        ]
+        if self.RX_Buffer:
+            self.RX_Buffer[:] = [
+                pkt for pkt in self.RX_Buffer
+                if not (pkt.sf == self.SF and pkt.channel == self.Channel)
+            ]
+        self.receptions.pop((self.Channel, self.SF), None)
+
+    def capture(self, environment: Environment):
+        """
+        Frame decodable on the current channel & SF under the interference
+        model of the environment, and its received power. Only re-evaluated
+        when frames start or end where the model looks.
+        """
+        key = (self.Channel, self.SF)
+        model = environment.interference
+        channel, sf = self.Channel - 1, self.SF - 7 # To have 1st indexed as 0
+        version = model.version(environment, channel, sf)
+        cached = self._capture_cache.get(key)
+        if cached is not None and cached[0] == version and cached[1] == self.RSSI:
+            return cached[2], cached[3]
+
+        frames = model.frames(environment, channel, sf)
+        rx_power = environment.lora_links.received_power(frames["source"], self.index)
+        # Frames of other SFs may interfere but are never received
+        sensitivity = np.where(frames["sf"] == sf, self.RSSI, np.inf)
+        decodable = np.flatnonzero(model.decodable(frames, rx_power, sensitivity))
+
+        winner, winner_power = None, None
+        if len(decodable) > 0:
+            strongest = decodable[np.argmax(rx_power[decodable])]
+            winner = environment.lora_signal(int(frames["id"][strongest]))
+            winner_power = float(rx_power[strongest])
+
+        self._capture_cache[key] = (version, self.RSSI, winner, winner_power)
+        return winner, winner_power
 
     def receive_packets_partial(self, environment: Environment):
-         packets_in_channel_sf = environment.lora_packet_over_air[self.Channel - 1][self.SF - 7].copy() # To have 1st indexed as 0
-         for i in range(len(packets_in_channel_sf)-1, -1, -1):
-             rx_power = Computations.calculate_received_power(Computations.distance(
-                 packets_in_channel_sf[i].signal.source_location, self.location),
-                 packets_in_channel_sf[i].signal.tx_power)
-
-             if rx_power < self.RSSI:
-                 del packets_in_channel_sf[i]
-                 continue
-             else:
-                 packets_in_channel_sf[i].signal.rx_power = rx_power
-                 packets_in_channel_sf[i].signal.lora_packet.received_power = rx_power # USED FROM GATEWAY - SERVER FOR ADR
-
-         if len(packets_in_channel_sf) < 1:
-             # nothing to compare
-             return None, None
-         elif len(packets_in_channel_sf) == 1:
-             if packets_in_channel_sf[0].signal.lora_packet.IsFirstPacket: # Receiving first segment of packet
-                self.clear_receiver_from_interrupted_packets()                                        # All the previous stored has no effect
+        key = (self.Channel, self.SF)
+        now = environment.time
+        winner, rx_power = self.capture(environment)
+
+        if winner is None:
+            # nothing to compare
+            return None, None
+
+        reception = self.receptions.get(key)
+        if reception is None or reception.signal is not winner:
+            if winner.start_time == now: # Receiving first part of the frame
+                self.clear_receiver_from_interrupted_packets() # All the previous stored has no effect
                 # print("RECEPTION START")
-             self.RX_Buffer.append(packets_in_channel_sf[0].signal.lora_packet)
-             if packets_in_channel_sf[0].toa_left == 0:
-                    return self.decode_packet(packets_in_channel_sf[0].signal.time_over_air_required)
-             elif packets_in_channel_sf[0].signal.lora_packet.IsFirstPacket:
-                 return Hardware.EVENTS.ClassA.RECEIVE_START, None
-             else:
-                 return None, None
-
-         else:
-             top_two = nlargest(2, packets_in_channel_sf, key=lambda p: p.signal.rx_power)
-
-             # capture effect (“capture margin” 6 dB)
-             if top_two[0].signal.rx_power - top_two[1].signal.rx_power >= 6: #  and False: ## Activate or deactivate capture effect
-                 if top_two[0].signal.lora_packet.IsFirstPacket:  # Receiving first segment of packet
-                     self.clear_receiver_from_interrupted_packets()
-                     # print("RECEPTION START")
-                 self.RX_Buffer.append(top_two[0].signal.lora_packet)
-                 if top_two[0].toa_left == 0:
-                    return self.decode_packet(top_two[0].signal.time_over_air_required)
-                 elif top_two[0].signal.lora_packet.IsFirstPacket:
-                     return Hardware.EVENTS.ClassA.RECEIVE_START, None
-                 else:
-                     return None, None
-             return None, None
-
-
-    def decode_packet(self, segments_required):
-        buckets: Dict[str, List[LoRaPacket]] = defaultdict(list)
-        for pkt in [
-            pkt for pkt in self.RX_Buffer
-            if (pkt.sf == self.SF and pkt.channel == self.Channel)
-        ]:
-            buckets[pkt.ID].append(pkt)
-        # print(dict(buckets))
-
-        for pkt in dict(buckets).values():
-            if segments_required - 1 < len(pkt) < segments_required + 1:
-                self.TX_Buffer.append(pkt[0]) # STORE FOR FORWARD
-                # self.RX_Buffer = []
-                # print("SUCCESSFULLY DECODED")
-                # print("RECEPTION END")
-
-                # Statistics
-                self.successfully_received_packets.append(pkt[0].ID)
-
-                return Hardware.EVENTS.ClassA.PACKET_DECODED, None
-            else:
-                # self.RX_Buffer = []
-                # print("DECODING ERROR")
-                # print("RECEPTION END")
-                return Hardware.EVENTS.ClassA.PACKET_NON_DECODED, None
+            reception = self.receptions[key] = _Reception(winner, rx_power)
+            self.RX_Buffer.append(winner.lora_packet)
+        reception.heard += 1
+
+        if winner.end_time == now:
+            return self.decode_packet(winner, now)
+        elif winner.start_time == now:
+            return Hardware.EVENTS.ClassA.RECEIVE_START, None
+        else:
+            return None, None
+
+    def decode_packet(self, signal: LoRaWirelessSignal, time: int):
+        reception = self.receptions.pop((self.Channel, self.SF), None)
+
+        # Decoded only if captured on every tick of the frame, never missed or taken over
+        if reception is not None and reception.signal is signal and reception.heard == signal.end_time - signal.start_time + 1:
+            self.accept_frame(signal, reception.rx_power, time)
+            # print("SUCCESSFULLY DECODED")
+            # print("RECEPTION END")
+            return Hardware.EVENTS.ClassA.PACKET_DECODED, None
+        else:
+            if reception is not None and self.metrics is not None:
+                self.metrics.frame_lost(reception.signal, reception.rx_power, time, self.index)
+            # print("DECODING ERROR")
+            # print("RECEPTION END")
+            return Hardware.EVENTS.ClassA.PACKET_NON_DECODED, None
+
+    def accept_frame(self, signal: LoRaWirelessSignal, rx_power: float, time: int):
+        """Store the packet of a successfully decoded frame."""
+        # Own copy, the frame is shared with every receiver
+        packet = copy.copy(signal.lora_packet)
+        packet.received_power = rx_power # USED FROM GATEWAY - SERVER FOR ADR
+        packet.set_reception_time(time)
+        self.TX_Buffer.append(packet) # STORE FOR FORWARD
+
+        # Statistics
+        if self.metrics is not None:
+            self.metrics.packet_decoded(packet, time, signal, self.index)
 
     # For Example for RX1 and RX2 like Delays
     def sleep_delay(self, time: int):
@@ -181,3 +212,25 @@ class LoRaModule:
         self.counter -= 1
         return None, None
 
+    def delay_expiry(self, time: int) -> float:
+        """First tick >= time at which a running sleep_delay returns DELAY_END."""
+        if self.counter is None:
+            return time # Delay not started yet, next call starts it
+        if self.counter < 1:
+            return math.inf # Never reaches 1 again
+        return time + self.counter - 1
+
+    def skip_delay(self, ticks: int):
+        # Same as calling sleep_delay for idle ticks that do not end the delay
+        if self.counter is not None:
+            self.counter -= ticks
+
+    def transmission_end(self, time: int) -> int:
+        """First tick >= time at which transmit_packet returns TRANSMISSION_END."""
+        if self.tx_ticks_left is None:
+            return time # Next call starts the frame
+        return time + self.tx_ticks_left - 1
+
+    def skip_transmission(self, ticks: int):
+        if self.tx_ticks_left is not None:
+            self.tx_ticks_left -= ticks
@@ -0,0 +1,21 @@
+from enum import IntEnum
+
+class ClassA(IntEnum):
+    SLEEP = 0
+    GENERATE_PACKET = 1
+    TRANSMIT_PACKET = 2
+    RECEIVE_DELAY_1 = 3
+    RX_1 = 4
+    RECEIVE_DELAY_2 = 5
+    RX_2 = 6
+    JOIN_DELAY = 7
+    JOIN_PACKET_GENERATION = 8
+    DECODE_JOIN_ACCEPT = 9
+    CONTENTION_WINDOW_DELAY = 10
+    ACCEPT_DELAY = 11
+    WAITING_FOR_JOIN_REQUESTS = 12
+    SENSING = 13
+    LISTEN_DELAY = 14
+    MULTIPLE_INPUT = 15
+    TRANSMIT_DELAY_1 = 16
+    GENERATE_ACCEPT_PACKET = 17
@@ -1,16 +1,31 @@
+import math
 from Wireless.signals import Location                 # your neutral datatypes module
 from Hardware.WakeUpRadioModule import WakeUpRadioModule
-from Hardware.LoRaModule import LoRaModule
+from Hardware.LoRaModule import LoRaModule, sleep
 
 class Action:
-    executable = None
-    args = []
+    """Next action of the device; listener is called when the executable changes."""
+
+    def __init__(self):
+        self.listener = None
+        self.executable = None
+        self.args = []
+
+    def __setattr__(self, name, value):
+        # Reads stay plain attribute lookups, only assignments are watched
+        changed = name == "executable" and value != self.__dict__.get("executable")
+        object.__setattr__(self, name, value)
+        if changed and self.listener is not None:
+            self.listener()
 
 class SensorNode:
     """
     Real-world sensor that sleeps until its wake-up receiver triggers,
     then forwards a LoRa packet.  Composition avoids circular imports.
     """
+    # Protocol state (Hardware.STATES) -> action(device, time, environment) -> (executable, args)
+    STATE_ACTIONS: dict = {}
+
     def __init__(self, node_id: str, wurx_json: str, lora_json: str, position: Location):
         self.ID = node_id
         self.location = position
@@ -24,6 +39,7 @@ class SensorNode:
 
         # Function que. The next action of sensor is defined
         self.action = Action()
+        self.state: int | None = None # Protocol state of the action
 
         # CLASS A PROTOCOL, PRESENTED IN ALL CLASSES
         self.receiving_windows_enabled: bool = False
@@ -33,3 +49,49 @@ class SensorNode:
 
         # The network where the device has joined
         self.joined_network_id = None
+
+    def enter(self, state: int, time: int, environment):
+        """Switch to a protocol state and its action."""
+        self.state = state
+        self.action.executable, self.action.args = self.STATE_ACTIONS[state](self, time, environment)
+
+    # ------------------------------------------------------------------
+    # Event driven engine hooks
+    # ------------------------------------------------------------------
+    def timed_actions(self) -> tuple:
+        """Actions that only count down lora.counter until their delay ends."""
+        return ()
+
+    def listening_actions(self) -> tuple:
+        """Actions that have to run on every tick with LoRa packets over the air."""
+        return ()
+
+    def is_transmitting(self) -> bool:
+        return self.action.executable in (self.lora.transmit_packet, self.wurx.transmit_beacon)
+
+    def is_listening(self) -> bool:
+        return self.action.executable in self.listening_actions()
+
+    def next_wakeup(self, time: int, traffic: bool = True) -> float:
+        """
+        First tick >= time at which running the current action (with no packets
+        over the air) does more than count down, e.g. the end of a transmitted
+        frame. Unknown actions run on every tick.
+        """
+        executable = self.action.executable
+        if executable == sleep:
+            return math.inf
+        if executable == self.lora.transmit_packet:
+            return self.lora.transmission_end(time)
+        if executable in self.timed_actions():
+            return self.lora.delay_expiry(time)
+        if executable in self.listening_actions():
+            return math.inf
+        return time
+
+    def skip_ticks(self, ticks: int):
+        """Apply the effect of ticks that were skipped while the device was idle."""
+        if self.action.executable == self.lora.transmit_packet:
+            self.lora.skip_transmission(ticks)
+        elif self.action.executable in self.timed_actions():
+            self.lora.skip_delay(ticks)
@@ -1,7 +1,6 @@
-import json
 from collections import deque
+from Utils import Config
 from Wireless.signals import OOKRZWirelessSignal, Location, WakeUpBeacon
-from Utils import Computations
 
 
 class WakeUpRadioModule:
@@ -13,22 +12,22 @@ class WakeUpRadioModule:
     def __init__(self, id: str, parameters_path: str, position: Location):
         self.ID: str = id
         self.location = position
+        self.index: int | None = None # Row / column in the environment link budget
 
         # ----------------------------------------------------------------
         # Load parameters from the JSON spec
         # ----------------------------------------------------------------
-        with open(parameters_path) as f:
-            p = json.load(f)
+        p = Config.wur_parameters(parameters_path) # Shared, parsed once
 
-        self.CenterFreq_MHz = p["center_frequency_MHz"]
-        self.RX_Bandwidth_MHz = p["bandwidth_MHz"]
-        self.Modulation = p["modulation"]  # “RZ-OOK”
-        self.CodeLen_bits = p["code_length_bits"]  # 11
-        self.Sensitivity_dBm = p["sensitivity_dBm"]  # −80.9
-        self.Latency_ms = p["latency_ms"]  # 110
-        self.PowerTX_dBm = p["transmission_power_dBm"]  # 14
-        self.FalseAlarmRate_hr = p["false_alarm_rate_per_hour"]
-        self.MissProb = p["missed_detection_ratio_at_sensitivity"]
+        self.CenterFreq_MHz = p.center_frequency_MHz
+        self.RX_Bandwidth_MHz = p.bandwidth_MHz
+        self.Modulation = p.modulation  # “RZ-OOK”
+        self.CodeLen_bits = p.code_length_bits  # 11
+        self.Sensitivity_dBm = p.sensitivity_dBm  # −80.9
+        self.Latency_ms = p.latency_ms  # 110
+        self.PowerTX_dBm = p.transmission_power_dBm  # 14
+        self.FalseAlarmRate_hr = p.false_alarm_rate_per_hour
+        self.MissProb = p.missed_detection_ratio_at_sensitivity
 
         # runtime state ---------------------------------------------------
         self.TX_Buffer: deque[WakeUpBeacon] = deque()  # beacons to send
@@ -50,14 +49,12 @@ class WakeUpRadioModule:
         Scan environment for beacons on our channel.
         If a beacon’s RX power ≥ sensitivity, start latency timer.
         """
-        beacons = environment.wur_packets_over_air
-        for sig in beacons:
-            rx_power = Computations.calculate_received_power(
-                Computations.distance(sig.signal.source_location, self.location), sig.signal.tx_power_dBm)
-            # check sensitivity
-            if rx_power >= self.Sensitivity_dBm and sig.toa_left == self.Latency_ms:
-                # start / refresh latency counter
-                self._latency_counter = self.Latency_ms
+        beacons = environment.wur_frames.live()
+        rx_power = environment.wur_links.received_power(beacons["source"], self.index)
+        # check sensitivity, beacon starting now
+        if ((rx_power >= self.Sensitivity_dBm) & (beacons["toa_left"] == self.Latency_ms)).any():
+            # start / refresh latency counter
+            self._latency_counter = self.Latency_ms
 
         # countdown latency counter
         if self._latency_counter > 0:
@@ -0,0 +1,154 @@
+"""
+Online metrics of a running simulation
+======================================
+The radios report packets and frames as they happen, so the metrics can be
+read at any time during a run::
+
+    metrics = sim.metrics
+    metrics.generated, metrics.delivered     # counters
+    metrics.pdr_per_node()                   # {source ID: delivered / generated}
+    metrics.latency_histogram()              # (bin edges ms, counts)
+    metrics.airtime_utilization(sim.environment.time)   # [channel, SF] busy fraction
+    metrics.snapshot(time)                   # all of the above as one dict
+
+Delivered packets are tracked in a bitmap of packet IDs (one bit per
+generated packet); everything else has a fixed size. With a
+Metrics.PacketLog.PacketLog as ``log`` every event is also logged per packet.
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+
+import numpy as np
+
+from Metrics import PacketLog
+
+__all__ = ["MetricsCollector"]
+
+N_CHANNELS = 9
+N_SF = 6        # SF7–SF12
+
+# Latency bins (ms), log-spaced from 1 ms to 1e7 ms; last bin also takes longer latencies
+LATENCY_BIN_EDGES = tuple(float(edge) for edge in np.logspace(0, 7, 57))
+
+
+@dataclass
+class NodeCounters:
+    generated: int = 0
+    delivered: int = 0
+
+
+class MetricsCollector:
+    """Counters, delivered-ID bitmap, latency histogram and airtime of one simulation."""
+
+    def __init__(self) -> None:
+        self.generated: int = 0
+        self.decoded: int = 0                # successful decodes, every receiver
+        self.delivered: int = 0              # distinct packets decoded by at least one receiver
+        self.interfered: int = 0             # frames locked by a receiver but lost to interference
+        self.no_path: int = 0                # frames heard by a gateway with every demodulator busy
+        self.log = None                      # Metrics.PacketLog.PacketLog, if any
+
+        self._first_id: int | None = None
+        self._delivered_ids = bytearray()    # bit (ID - first ID) set once delivered
+        self._nodes: dict = {}               # source ID -> NodeCounters
+
+        # Environment time at which the protocol clock (GenerationTime) restarted from 0
+        self.clock_offset: int = 0
+        self._latency_counts = [0] * len(LATENCY_BIN_EDGES)
+        self._latency_sum: float = 0.0
+        self.airtime = np.zeros((N_CHANNELS, N_SF), dtype=np.int64) # ticks on air per [channel, SF]
+
+    # ------------------------------------------------------------------
+    # Hooks, called by the radios
+    # ------------------------------------------------------------------
+    def packet_generated(self, packet) -> None:
+        if self._first_id is None:
+            self._first_id = packet.ID
+        self.generated += 1
+        self._node(packet.Source).generated += 1
+        if self.log is not None:
+            self.log.generated(packet, packet.GenerationTime + self.clock_offset)
+
+    def packet_decoded(self, packet, time: int, signal=None, receiver: int = -1) -> None:
+        self.decoded += 1
+        if self.log is not None and signal is not None:
+            self.log.received(signal, packet.received_power, packet.GenerationTime + self.clock_offset, time,
+                              receiver, PacketLog.DECODED)
+        if self._first_id is None or packet.ID < self._first_id:
+            return # Generated before the collector was attached
+        bit = packet.ID - self._first_id
+        byte, mask = bit >> 3, 1 << (bit & 7)
+        if byte >= len(self._delivered_ids):
+            self._delivered_ids.extend(bytes(max(byte + 1 - len(self._delivered_ids), 1024)))
+        if self._delivered_ids[byte] & mask:
+            return # Already delivered through another receiver
+        self._delivered_ids[byte] |= mask
+
+        self.delivered += 1
+        self._node(packet.Source).delivered += 1
+        latency = time - self.clock_offset - packet.GenerationTime
+        self._latency_sum += latency
+        self._latency_counts[max(0, min(bisect.bisect_right(LATENCY_BIN_EDGES, latency) - 1,
+                                        len(LATENCY_BIN_EDGES) - 1))] += 1
+
+    def frame_lost(self, signal, rx_power: float, time: int, receiver: int, no_path: bool = False) -> None:
+        """A receiver heard *signal* but did not decode it: interference, or no free demodulator."""
+        if no_path:
+            self.no_path += 1
+        else:
+            self.interfered += 1
+        if self.log is not None:
+            self.log.received(signal, rx_power, signal.lora_packet.GenerationTime + self.clock_offset, time,
+                              receiver, PacketLog.NO_PATH if no_path else PacketLog.INTERFERED)
+
+    def frame_transmitted(self, channel: int, sf: int, ticks: int) -> None:
+        self.airtime[channel - 1, sf - 7] += ticks
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state["log"] = None # An open file, stays with its simulation
+        return state
+
+    # ------------------------------------------------------------------
+    # Readouts
+    # ------------------------------------------------------------------
+    def pdr(self) -> float:
+        return self.delivered / self.generated if self.generated else 0.0
+
+    def pdr_per_node(self) -> dict:
+        return {source: counters.delivered / counters.generated if counters.generated else 0.0
+                for source, counters in self._nodes.items()}
+
+    def latency_histogram(self) -> tuple:
+        """(bin lower edges in ms, counts); latencies below 1 ms fall in the first bin."""
+        return LATENCY_BIN_EDGES, tuple(self._latency_counts)
+
+    def mean_latency(self) -> float:
+        return self._latency_sum / self.delivered if self.delivered else float("nan")
+
+    def airtime_utilization(self, time: int) -> np.ndarray:
+        """Fraction of the first *time* ticks each [channel, SF] was busy (frames may overlap)."""
+        return self.airtime / time if time > 0 else np.zeros_like(self.airtime, dtype=float)
+
+    def snapshot(self, time: int) -> dict:
+        return {
+            "time": time,
+            "generated": self.generated,
+            "decoded": self.decoded,
+            "delivered": self.delivered,
+            "interfered": self.interfered,
+            "no_path": self.no_path,
+            "pdr": self.pdr(),
+            "pdr_per_node": self.pdr_per_node(),
+            "mean_latency_ms": self.mean_latency(),
+            "latency_histogram": dict(zip(LATENCY_BIN_EDGES, self._latency_counts)),
+            "airtime_utilization": self.airtime_utilization(time).tolist(),
+        }
+
+    def _node(self, source: str) -> NodeCounters:
+        counters = self._nodes.get(source)
+        if counters is None:
+            counters = self._nodes[source] = NodeCounters()
+        return counters
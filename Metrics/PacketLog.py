@@ -0,0 +1,201 @@
+"""
+Per-packet event log
+====================
+An optional log of every packet event, for collision and latency analysis
+after the run::
+
+    sim = Simulation(..., packet_log="Results/run.npz")   # or "...parquet"
+    sim.initialize_network(); sim.run()
+    sim.end_of_simulation()                                # closes the log
+
+    columns, devices = load_packet_log("Results/run.npz")
+    decoded = columns["outcome"] == OUTCOMES.index("decoded")
+    latency = columns["time"][decoded] - columns["generation_time"][decoded]
+
+One row per event: a packet generated at its source, decoded by a receiver,
+lost to interference at a receiver, or dropped by a gateway with every
+demodulator path busy. Rows are appended to typed column buffers (no Python
+object per row) and written out every *chunk_size* rows, so the memory used
+does not grow with the length of the run. A join restored from a
+checkpoint has no events in the log. Formats:
+
+- ``.npz``: one member per column and chunk (``chunk-00000/time.npy``, ...),
+  plus ``devices.npy``; numpy only.
+- ``.parquet``: one row group per chunk, the device IDs in the schema
+  metadata; needs pyarrow.
+
+Columns: packet_id, source (device index of the packet's origin), sender
+(device index that transmitted the frame, -1 for generation), receiver
+(-1 for generation), sf, channel, generation_time and time (event time), both
+in environment ms, rx_power (dBm, NaN for generation), outcome (index in
+OUTCOMES) and hop (hop depth of the sender, -1 outside multihop).
+"""
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+__all__ = ["PacketLog", "load_packet_log", "read_packet_log", "OUTCOMES", "COLUMNS"]
+
+OUTCOMES = ("generated", "decoded", "interfered", "no_path")
+GENERATED, DECODED, INTERFERED, NO_PATH = range(len(OUTCOMES))
+
+# Column -> array typecode (also a numpy dtype character)
+COLUMNS = {
+    "packet_id": "q",
+    "source": "i",
+    "sender": "i",
+    "receiver": "i",
+    "sf": "b",
+    "channel": "b",
+    "generation_time": "q",
+    "time": "q",
+    "rx_power": "f",
+    "outcome": "b",
+    "hop": "h",
+}
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class PacketLog:
+    """Column buffers of packet events, flushed to a .npz or .parquet file."""
+
+    def __init__(self, path, devices, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = Path(path)
+        if self.path.suffix not in (".npz", ".parquet"):
+            raise ValueError(f"Packet log {path} must be a .npz or .parquet file")
+        self.chunk_size = chunk_size
+        self.devices = devices
+        self.device_ids = [device.lora.ID for device in devices]
+        self._index = {ID: index for index, ID in enumerate(self.device_ids)}
+
+        self._columns = {name: array(code) for name, code in COLUMNS.items()}
+        self._append = tuple(column.append for column in self._columns.values())
+        self.rows: int = 0      # written and buffered
+        self.chunks: int = 0    # written
+        self._writer = None     # zipfile.ZipFile or pyarrow.parquet.ParquetWriter, opened by the first flush
+        self.closed = False
+
+    # ------------------------------------------------------------------
+    # Events, called by the metrics collector
+    # ------------------------------------------------------------------
+    def generated(self, packet, generation_time: int) -> None:
+        source = self._index.get(packet.Source, -1)
+        self._row(packet.ID, source, -1, -1, packet.sf, packet.channel, generation_time, generation_time,
+                  float("nan"), GENERATED, self._hop(source))
+
+    def received(self, signal, rx_power: float, generation_time: int, time: int, receiver: int,
+                 outcome: int) -> None:
+        packet = signal.lora_packet
+        sender = signal.source_index
+        self._row(packet.ID, self._index.get(packet.Source, -1), sender, receiver, signal.sf, signal.channel,
+                  generation_time, time, rx_power, outcome, self._hop(sender))
+
+    def _hop(self, index: int) -> int:
+        return getattr(self.devices[index], "hop_depth", -1) if index >= 0 else -1
+
+    def _row(self, *values) -> None:
+        for append, value in zip(self._append, values):
+            append(value)
+        self.rows += 1
+        if len(self._columns["packet_id"]) >= self.chunk_size:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+    def flush(self) -> None:
+        """Write the buffered rows as one chunk."""
+        if not len(self._columns["packet_id"]):
+            return
+        chunk = {name: np.frombuffer(column, dtype=column.typecode).copy()
+                 for name, column in self._columns.items()}
+        if self._writer is None:
+            self._open()
+        if self.path.suffix == ".npz":
+            for name, values in chunk.items():
+                _write_member(self._writer, f"chunk-{self.chunks:05d}/{name}.npy", values)
+        else:
+            import pyarrow as pa
+            self._writer.write_table(pa.table(chunk, schema=self._writer.schema))
+        self.chunks += 1
+        for name, code in COLUMNS.items():
+            self._columns[name] = array(code)
+        self._append = tuple(column.append for column in self._columns.values())
+
+    def close(self) -> None:
+        """Flush and finish the file; later calls do nothing."""
+        if self.closed:
+            return
+        self.flush()
+        if self._writer is None:
+            self._open() # Empty log, still a valid file
+        if self.path.suffix == ".npz":
+            _write_member(self._writer, "devices.npy", np.array(self.device_ids, dtype=str))
+        self._writer.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix == ".npz":
+            self._writer = zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED, allowZip64=True)
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("A .parquet packet log needs pyarrow, use a .npz file otherwise") from error
+        schema = pa.schema([(name, pa.from_numpy_dtype(np.dtype(code))) for name, code in COLUMNS.items()],
+                           metadata={"devices": json.dumps(self.device_ids), "outcomes": json.dumps(OUTCOMES)})
+        self._writer = pq.ParquetWriter(self.path, schema)
+
+
+def _write_member(archive: zipfile.ZipFile, name: str, values: np.ndarray) -> None:
+    with archive.open(name, "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, values, allow_pickle=False)
+
+
+def read_packet_log(path):
+    """Yield the chunks of a packet log as {column: array}, one at a time."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        for group in range(parquet.num_row_groups):
+            table = parquet.read_row_group(group)
+            yield {name: table.column(name).to_numpy() for name in COLUMNS}
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        chunks = sorted({name.split("/")[0] for name in archive.namelist() if name.startswith("chunk-")})
+        for chunk in chunks:
+            yield {name: np.lib.format.read_array(io.BytesIO(archive.read(f"{chunk}/{name}.npy")))
+                   for name in COLUMNS}
+
+
+def load_packet_log(path) -> tuple:
+    """({column: array} of the whole log, device IDs by index)."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        devices = json.loads(pq.read_schema(path).metadata[b"devices"])
+    else:
+        with zipfile.ZipFile(path) as archive:
+            devices = np.lib.format.read_array(io.BytesIO(archive.read("devices.npy"))).tolist()
+
+    chunks = list(read_packet_log(path))
+    if not chunks:
+        return {name: np.empty(0, dtype=code) for name, code in COLUMNS.items()}, devices
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS}, devices
@@ -17,15 +17,42 @@ If *sim_duration_ms* and *slot_ms* are provided the class derives the
 falls back to using the first positional argument (*gen_prob*) exactly as
 before.  The extra keyword arguments therefore do **not** break existing
 code.
+
+Independent replications of a load point (e.g. from Sweep.run_replications)
+are recorded together and reported as mean ± 95 % confidence interval::
+
+    stats.add_replications(probability_generation,
+                           [(generated, received), ...],   # one per seed
+                           sim_duration_ms=500_000, slot_ms=1_000)
+    stats.summary()                  # mean / std / CI of G and S per point
+    stats.plot("SIMULATION 1")       # with error bars
 """
 from __future__ import annotations
 
-import matplotlib.pyplot as plt
 import numpy as np
 from dataclasses import dataclass, field
 from typing import List, Optional
 
-__all__ = ["AlohaValidation"]
+__all__ = ["AlohaValidation", "mean_confidence_interval"]
+
+# Two-sided 95 % Student t quantiles, degrees of freedom 1-30; normal beyond
+_T_975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+          2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+          2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+def mean_confidence_interval(values) -> tuple:
+    """(mean, sample std, half width of the 95 % CI); std and CI are nan below two values."""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan, np.nan
+    mean = float(values.mean())
+    if n < 2:
+        return mean, np.nan, np.nan
+    std = float(values.std(ddof=1))
+    t = _T_975[n - 2] if n - 1 <= len(_T_975) else 1.960
+    return mean, std, float(t * std / np.sqrt(n))
 
 # ---------------------------------------------------------------------
 # Per‑run record
@@ -37,12 +64,32 @@ class RunStat:
     tx_packets:     int          # raw counters kept for reference
     rx_packets:     int
 
+# ---------------------------------------------------------------------
+# Replications of one load point
+# ---------------------------------------------------------------------
+@dataclass
+class PointStat:
+    runs:   List[RunStat]            # one per replication
+    G_mean: float
+    G_std:  float
+    G_ci:   float                    # half width of the 95 % CI
+    S_mean: float
+    S_std:  float
+    S_ci:   float
+
+    @classmethod
+    def from_runs(cls, runs: List[RunStat]) -> "PointStat":
+        G = mean_confidence_interval([r.offered_load_G for r in runs])
+        S = mean_confidence_interval([r.throughput_S for r in runs])
+        return cls(runs, *G, *S)
+
 # ---------------------------------------------------------------------
 # Main container
 # ---------------------------------------------------------------------
 @dataclass
 class AlohaValidation:
     runs: List[RunStat] = field(default_factory=list)
+    points: List[PointStat] = field(default_factory=list)
 
     # --------------------------------------------------
     # Record one completed simulation
@@ -75,6 +122,37 @@ class AlohaValidation:
             Needed only if you want a theoretical G = N·p on the plot when
             *sim_duration_ms* is not given.
         """
+        self.runs.append(self._run_stat(gen_prob, tx_packets, rx_packets,
+                                        sim_duration_ms, slot_ms, n_nodes))
+
+    # --------------------------------------------------
+    # Record the replications of one load point
+    # --------------------------------------------------
+    def add_replications(
+        self,
+        gen_prob: float,
+        results: List[tuple],
+        *,
+        sim_duration_ms: Optional[int] = None,
+        slot_ms:         int = 1_000,
+        n_nodes:         Optional[int] = None,
+    ) -> PointStat:
+        """Store independent runs of one load point, *results* being
+        (tx_packets, rx_packets) per seed.  Arguments as in add_run."""
+        point = PointStat.from_runs([self._run_stat(gen_prob, tx, rx, sim_duration_ms, slot_ms, n_nodes)
+                                     for tx, rx in results])
+        self.points.append(point)
+        return point
+
+    def summary(self) -> List[dict]:
+        """Mean, standard deviation and 95 % CI half width of G and S per load point."""
+        return [{"replications": len(p.runs),
+                 "G_mean": p.G_mean, "G_std": p.G_std, "G_ci": p.G_ci,
+                 "S_mean": p.S_mean, "S_std": p.S_std, "S_ci": p.S_ci}
+                for p in sorted(self.points, key=lambda p: p.G_mean)]
+
+    @staticmethod
+    def _run_stat(gen_prob, tx_packets, rx_packets, sim_duration_ms, slot_ms, n_nodes) -> RunStat:
         # ----------------------------------------------------------------
         # Compute offered load G and throughput S
         # ----------------------------------------------------------------
@@ -87,23 +165,35 @@ class AlohaValidation:
             offered_load_G = gen_prob if n_nodes is None else gen_prob * n_nodes
             throughput_S   = (rx_packets / tx_packets) if tx_packets else 0.0
 
-        self.runs.append(RunStat(offered_load_G, throughput_S,
-                                 tx_packets, rx_packets))
+        return RunStat(offered_load_G, throughput_S, tx_packets, rx_packets)
 
     # --------------------------------------------------
     # Plot curves
     # --------------------------------------------------
     def plot(self, title_suffix: str = "") -> None:
-        if not self.runs:
+        import matplotlib.pyplot as plt # Only plotting needs it, keeps the simulation imports light
+
+        if not self.runs and not self.points:
             raise RuntimeError("No runs recorded – did you call add_run()?")
 
-        runs_sorted = sorted(self.runs, key=lambda r: r.offered_load_G)
-        G = np.array([r.offered_load_G for r in runs_sorted])
-        S = np.array([r.throughput_S   for r in runs_sorted])
+        if self.points:
+            points_sorted = sorted(self.points, key=lambda p: p.G_mean)
+            G = np.array([p.G_mean for p in points_sorted])
+            S = np.array([p.S_mean for p in points_sorted])
+            G_err = np.nan_to_num([p.G_ci for p in points_sorted])
+            S_err = np.nan_to_num([p.S_ci for p in points_sorted])
+        else:
+            runs_sorted = sorted(self.runs, key=lambda r: r.offered_load_G)
+            G = np.array([r.offered_load_G for r in runs_sorted])
+            S = np.array([r.throughput_S   for r in runs_sorted])
+            G_err = S_err = None
 
         # ---------------- throughput curve ---------------------------
         plt.figure(figsize=(6, 4))
-        plt.plot(G, S, "o-", label="Simulation")
+        if G_err is None:
+            plt.plot(G, S, "o-", label="Simulation")
+        else:
+            plt.errorbar(G, S, xerr=G_err, yerr=S_err, fmt="o-", capsize=3, label="Simulation (95% CI)")
         plt.plot(G, G * np.exp(-2 * G), "k--", label="$S = G e^{-2G}$ theory")
         plt.title(f"Throughput vs Offered Load {title_suffix}")
         plt.xlabel("Offered load  $G$")
@@ -116,7 +206,15 @@ class AlohaValidation:
         # ---------------- loss curve --------------------------------
         loss = 1 - np.divide(S, G, out=np.zeros_like(S), where=G > 0)
         plt.figure(figsize=(6, 4))
-        plt.plot(G, loss * 100, "o-")
+        if self.points:
+            # Loss of each replication, then mean ± CI per point
+            loss_stats = [mean_confidence_interval([1 - r.throughput_S / r.offered_load_G
+                                                    for r in p.runs if r.offered_load_G > 0])
+                          for p in points_sorted]
+            plt.errorbar(G, [m * 100 for m, _, _ in loss_stats],
+                         yerr=np.nan_to_num([ci * 100 for _, _, ci in loss_stats]), fmt="o-", capsize=3)
+        else:
+            plt.plot(G, loss * 100, "o-")
         plt.title(f"Packet‑loss probability {title_suffix}")
         plt.xlabel("Offered load  $G$")
         plt.ylabel("Loss (%)")
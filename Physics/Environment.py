@@ -1,54 +1,149 @@
+import numpy as np
 import Utils.Computations
+from Physics.Interference import CaptureModel
+from Physics.LinkBudget import LinkBudget
 from Wireless.signals import LoRaWirelessSignal, OOKRZWirelessSignal
-from typing import List
 
 N_CHANNELS = 9
 N_SF       = 6          # SF7–SF12
 
-class _PacketRecord:
+# One row per frame over the air
+LORA_FRAME = np.dtype([
+    ("id",       np.int64),     # frame id, key in _FrameTable.signals
+    ("source",   np.int32),     # device index of the transmitter (link budget row)
+    ("channel",  np.int8),      # channel index 0-8
+    ("sf",       np.int8),      # SF index 0-5
+    ("tx_power", np.float64),   # dBm
+    ("toa_left", np.int32),     # time-over-air still to elapse (ticks)
+])
+
+WUR_FRAME = np.dtype([
+    ("id",       np.int64),
+    ("source",   np.int32),
+    ("toa_left", np.int32),
+])
+
+
+class _FrameTable:
+    """
+    Growable structured array of in-flight frames; rows [0, size) are live.
+    The signal objects are kept aside, keyed by frame id.
+    """
+
+    def __init__(self, dtype: np.dtype, capacity: int = 64) -> None:
+        self.rows = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+        self.signals: dict = {}
+        self.min_toa_left = 0 # smallest toa_left, nothing expires before it is negative
+
+    def live(self) -> np.ndarray:
+        return self.rows[:self.size]
+
+    def append(self, frame_id: int, signal, **columns) -> None:
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros_like(self.rows)])
+        row = self.rows[self.size]
+        row["id"] = frame_id
+        for name, value in columns.items():
+            row[name] = value
+        self.min_toa_left = row["toa_left"] if self.size == 0 else min(self.min_toa_left, row["toa_left"])
+        self.size += 1
+        self.signals[frame_id] = signal
+
+    def tick(self) -> np.ndarray:
+        """Decrease every timer by one, drop the expired rows and return them."""
+        live = self.live()
+        live["toa_left"] -= 1
+        self.min_toa_left -= 1
+        if self.min_toa_left >= 0:
+            return live[:0]
+
+        expired = live["toa_left"] < 0
+        gone = live[expired]
+        alive = live[~expired]
+        self.rows[:len(alive)] = alive
+        self.size = len(alive)
+        self.min_toa_left = alive["toa_left"].min() if len(alive) else 0
+        for frame_id in gone["id"].tolist():
+            del self.signals[frame_id]
+        return gone
 
-    def __init__(self, signal: LoRaWirelessSignal | OOKRZWirelessSignal, toa_left: int) -> None:
-        self.signal    = signal          # the original WirelessSignal instance
-        self.toa_left  = int(toa_left)   # time-over-air still to elapse (ticks)
-
-    def tick(self) -> bool:
-        """Decrease timer by one; return True if the packet is still alive."""
-        self.toa_left -= 1
-        return self.toa_left >= 0
 
 class Environment:
         """
-        Stores in-flight LoRa packets in a 2-D bucket:
-          lora_packet_over_air[channel][sf] -> List[_PacketRecord]
+        Stores in-flight LoRa frames in one array-backed table with columns
+        id / source / channel / sf / tx_power / toa_left, queried per (channel, SF):
+          lora_bucket(channel, sf) -> rows of LORA_FRAME
 
         Channel index 0-8 corresponds to the nine EU868 125-kHz channels
         SF index 0-5   corresponds to SF7 … SF12.
+
+        Every LoRa frame is one row for its whole airtime, from
+        signal.start_time to signal.end_time (ticks, both included).
         """
         N_CHANNELS = 9
         N_SF = 6  # SF7–SF12
 
         def __init__(self) -> None:
-            # channel first, SF second (so env[chan][sf])
-            self.lora_packet_over_air: List[List[List[_PacketRecord]]] = [
-                [[] for _ in range(self.N_SF)] for _ in range(self.N_CHANNELS)
-            ]
+            self.lora_frames = _FrameTable(LORA_FRAME)
+            self.wur_frames = _FrameTable(WUR_FRAME)
+            self._next_frame_id: int = 0
+            self._occupied_cells = (-1, []) # (lora_version, cells)
+
+            self.time: int = 0 # current tick
+            # bumped whenever a frame starts or ends in a bucket, env[chan, sf]
+            self.lora_bucket_version = np.zeros((self.N_CHANNELS, self.N_SF), dtype=np.int64)
+            self.lora_version: int = 0 # same, for any bucket
 
-            self.wur_packets_over_air: List[_PacketRecord] = []
+            # Called with (signal, environment) for every new LoRa frame, e.g. gateway receivers
+            self.lora_listeners: list = []
+
+            # Link budget, received power (dBm) by source & receiver index
+            self.lora_links: LinkBudget | None = None
+            self.wur_links: LinkBudget | None = None
+
+            # Which concurrent frames receivers decode, see Physics.Interference
+            self.interference = CaptureModel()
 
         # ------------------------------------------------------------------
         # Public API
         # ------------------------------------------------------------------
         def add_packet(self, signal: LoRaWirelessSignal) -> None:
-            """Insert a new packet with its initial airtime budget (in ticks)."""
+            """Insert a new frame, over the air from now for its airtime (in ticks)."""
             if signal is None:
                 return
             self._check_indices(signal.channel - 1, signal.sf - 7) # check channel and sf
-            signal.time_over_air_required = Utils.Computations.toa(Utils.Computations.compute_payload_size(signal.lora_packet.Payload),signal.sf)
-            self.lora_packet_over_air[signal.channel - 1][signal.sf - 7].append(_PacketRecord(signal, signal.lora_packet.segment_counter))
+            ticks = Utils.Computations.airtime_ticks(signal.time_over_air_required)
+            signal.start_time = self.time
+            signal.end_time = self.time + ticks - 1
+            signal.frame_id = self._new_frame_id()
+            self.lora_frames.append(signal.frame_id, signal,
+                                    source=signal.source_index, channel=signal.channel - 1, sf=signal.sf - 7,
+                                    tx_power=signal.tx_power, toa_left=ticks - 1)
+            self.lora_bucket_version[signal.channel - 1, signal.sf - 7] += 1
+            self.lora_version += 1
+            for listener in self.lora_listeners:
+                listener(signal, self)
+
+        def set_link_budget(self, devices) -> None:
+            """
+            Received power of the links in range, computed once since positions
+            never change during a run. Device i must have index i.
+            """
+            x = [device.location.x for device in devices]
+            y = [device.location.y for device in devices]
+            self.lora_links = LinkBudget.from_positions(
+                x, y, [device.lora.PowerTX for device in devices],
+                min(min(device.lora.RSSIs.values()) for device in devices))
+            self.wur_links = LinkBudget.from_positions(
+                x, y, [device.wurx.PowerTX_dBm for device in devices],
+                min(device.wurx.Sensitivity_dBm for device in devices))
 
         def add_wake_up_beacon(self, signal: OOKRZWirelessSignal) -> None:
             if not isinstance(signal, OOKRZWirelessSignal) : return
-            self.wur_packets_over_air.append(_PacketRecord(signal, signal.time_over_air_required))
+            signal.frame_id = self._new_frame_id()
+            self.wur_frames.append(signal.frame_id, signal,
+                                   source=signal.source_index, toa_left=signal.time_over_air_required)
 
         def tick(self) -> None:
             """
@@ -56,22 +151,54 @@ class Environment:
             – decrement airtime for every packet
             – drop records whose timer reached zero.
             """
-            for ch_buckets in self.lora_packet_over_air:
-                for bucket in ch_buckets:
-                    # iterate in place while safely removing dead packets
-                    i = 0
-                    while i < len(bucket):
-                        bucket.pop(i)  # drop expired fragment of packet
+            self.time += 1
+            if self.lora_frames.size:
+                ended = self.lora_frames.tick()
+                if len(ended):
+                    np.add.at(self.lora_bucket_version, (ended["channel"], ended["sf"]), 1)
+                    self.lora_version += 1
 
             """
             Handle wur radio signal same way
             """
-            i = 0
-            while i < len(self.wur_packets_over_air):
-                if self.wur_packets_over_air[i].tick():
-                    i += 1  # packet still active
-                else:
-                    self.wur_packets_over_air.pop(i)  # drop expired packet
+            if self.wur_frames.size:
+                self.wur_frames.tick()
+
+        def lora_bucket(self, channel: int, sf: int) -> np.ndarray:
+            """Rows of the frames over the air on one channel & SF index."""
+            live = self.lora_frames.live()
+            return live[(live["channel"] == channel) & (live["sf"] == sf)]
+
+        def lora_channel(self, channel: int) -> np.ndarray:
+            """Rows of the frames over the air on one channel index, any SF."""
+            live = self.lora_frames.live()
+            return live[live["channel"] == channel]
+
+        def lora_signal(self, frame_id: int) -> LoRaWirelessSignal:
+            return self.lora_frames.signals[frame_id]
+
+        def occupied_cells(self) -> list:
+            """(channel, sf) indices with frames over the air, channel first."""
+            version, cells = self._occupied_cells
+            if version != self.lora_version:
+                live = self.lora_frames.live()
+                codes = np.unique(live["channel"].astype(np.int64) * self.N_SF + live["sf"])
+                cells = [divmod(int(code), self.N_SF) for code in codes]
+                self._occupied_cells = (self.lora_version, cells)
+            return cells
+
+        def has_lora_packets(self) -> bool:
+            return self.lora_frames.size > 0
+
+        def is_idle(self) -> bool:
+            """True when nothing is over the air, so ticks can be skipped."""
+            return not self.wur_frames.size and not self.lora_frames.size
+
+        def skip(self, ticks: int) -> None:
+            """Advance the clock over idle ticks."""
+            if not self.is_idle():
+                raise RuntimeError("Cannot skip ticks with packets over the air")
+            self.time += ticks
 
         # ------------------------------------------------------------------
         # Helpers
@@ -80,19 +207,19 @@ class Environment:
             if not (0 <= channel < self.N_CHANNELS and 0 <= sf < self.N_SF):
                 raise IndexError("channel or SF index out of range")
 
+        def _new_frame_id(self) -> int:
+            self._next_frame_id += 1
+            return self._next_frame_id
+
         def snapshot_remaining_toa(self) -> list:
             """Nested plain-Python list; always works."""
             return [
-                [[p.toa_left for p in bucket] for bucket in ch_buckets]
-                for ch_buckets in self.lora_packet_over_air
+                [self.lora_bucket(channel, sf)["toa_left"].tolist() for sf in range(self.N_SF)]
+                for channel in range(self.N_CHANNELS)
             ]
 
         def snapshot_remaining_wur(self) -> list:
-            return [p.toa_left for p in self.wur_packets_over_air]
+            return self.wur_frames.live()["toa_left"].tolist()
 
         def __str__(self) -> str:
             return str(self.snapshot_remaining_toa())
-
-
-
-
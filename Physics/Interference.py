@@ -0,0 +1,110 @@
+"""
+Interference models
+===================
+Decide which of the LoRa frames over the air a receiver can decode, given
+their received powers. Receivers (LoRaModule.capture, GatewayReceiver) ask
+the model of the environment only when frames start or end, and the model
+judges all concurrent frames at once with array operations::
+
+    environment.interference = make_interference_model("sinr")
+
+- "capture" (default): frames only collide within one channel & SF, and only
+  frames above the receiver sensitivity count. The strongest one is decoded
+  if it is at least margin_db (6 dB) above the second strongest.
+- "sinr": every frame of the channel interferes, whatever its SF. A frame of
+  SF i is decoded if it is above the sensitivity and its power is at least
+  the sum of the powers P_j * 10^(T[i][j] / 10) of all other frames, T being
+  the signal-to-interference threshold matrix in dB (rows: SF7..SF12 of the
+  wanted frame, columns: SF of the interferer). This is cumulative
+  interference in linear units, with imperfect SF orthogonality. Noise is
+  covered by the sensitivity. Links below the lowest sensitivity of the
+  network are not in the link budget and do not interfere.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+__all__ = ["CaptureModel", "SINRModel", "INTERFERENCE_MODELS", "make_interference_model",
+           "SIR_THRESHOLD_DB"]
+
+CAPTURE_MARGIN_DB = 6
+
+# SIR thresholds (dB), wanted SF7..SF12 x interfering SF7..SF12. Off the
+# diagonal: imperfect orthogonality measured by Croce et al. (2018); on it the
+# co-SF capture margin of the capture model.
+SIR_THRESHOLD_DB = (
+    (CAPTURE_MARGIN_DB, -8, -9, -9, -9, -9),
+    (-11, CAPTURE_MARGIN_DB, -11, -12, -13, -13),
+    (-15, -13, CAPTURE_MARGIN_DB, -13, -14, -15),
+    (-19, -18, -17, CAPTURE_MARGIN_DB, -17, -18),
+    (-22, -22, -21, -20, CAPTURE_MARGIN_DB, -20),
+    (-25, -25, -25, -24, -23, CAPTURE_MARGIN_DB),
+)
+
+
+class CaptureModel:
+    """Capture effect within one channel & SF: strongest heard frame by margin_db over the runner-up."""
+
+    unheard_frames_interfere = False # frames below the sensitivity change no decision
+
+    def __init__(self, margin_db: float = CAPTURE_MARGIN_DB):
+        self.margin_db = margin_db
+
+    def version(self, environment, channel: int, sf: int) -> int:
+        """Changes whenever the decision for a receiver on channel & SF (indices) may change."""
+        return int(environment.lora_bucket_version[channel, sf])
+
+    def frames(self, environment, channel: int, sf: int) -> np.ndarray:
+        """Frames over the air that matter to a receiver on channel & SF (indices)."""
+        return environment.lora_bucket(channel, sf)
+
+    def decodable(self, frames: np.ndarray, rx_power: np.ndarray, sensitivity: np.ndarray) -> np.ndarray:
+        """Mask of the frames decodable now, given their received power and sensitivity (dBm)."""
+        decoded = np.zeros(len(frames), dtype=bool)
+        heard = np.flatnonzero(rx_power >= sensitivity)
+        if len(heard) == 0:
+            return decoded
+        heard_power = rx_power[heard]
+        strongest = int(np.argmax(heard_power))
+        runner_up = np.max(np.delete(heard_power, strongest)) if len(heard_power) > 1 else -np.inf
+        if heard_power[strongest] - runner_up >= self.margin_db:
+            decoded[heard[strongest]] = True
+        return decoded
+
+
+class SINRModel:
+    """Cumulative interference of every frame of the channel, weighted by the SIR threshold of each SF pair."""
+
+    unheard_frames_interfere = True
+
+    def __init__(self, sir_threshold_db=SIR_THRESHOLD_DB):
+        thresholds = np.asarray(sir_threshold_db, dtype=float)
+        if thresholds.shape != (6, 6):
+            raise ValueError(f"sir_threshold_db must be 6x6 (SF7..SF12), got shape {thresholds.shape}")
+        self.weights = 10 ** (thresholds / 10)
+
+    def version(self, environment, channel: int, sf: int) -> int:
+        return int(environment.lora_bucket_version[channel].sum())
+
+    def frames(self, environment, channel: int, sf: int) -> np.ndarray:
+        return environment.lora_channel(channel)
+
+    def decodable(self, frames: np.ndarray, rx_power: np.ndarray, sensitivity: np.ndarray) -> np.ndarray:
+        sf = frames["sf"]
+        power = 10 ** (rx_power / 10) # mW, 0 out of range
+        weights = self.weights[sf[:, None], sf[None, :]]
+        interference = weights @ power - weights.diagonal() * power
+        return (rx_power >= sensitivity) & (power >= interference)
+
+
+INTERFERENCE_MODELS = {
+    "capture": CaptureModel,
+    "sinr": SINRModel,
+}
+
+
+def make_interference_model(name: str, **parameters):
+    """Interference model by name, parameters passed to its constructor."""
+    if name not in INTERFERENCE_MODELS:
+        raise ValueError(f"Unknown interference model {name!r}, expected one of {sorted(INTERFERENCE_MODELS)}")
+    return INTERFERENCE_MODELS[name](**parameters)
@@ -0,0 +1,39 @@
+import numpy as np
+import Utils.Computations
+from Utils.SpatialIndex import GridIndex
+
+
+class LinkBudget:
+    """
+    Received power (dBm) of every link that can be heard, i.e. of the device
+    pairs within the range given by the lowest sensitivity. Pairs are found
+    with a grid index and stored per receiver, sorted by source; any other
+    link is below every sensitivity and reads as -inf.
+    """
+
+    def __init__(self, n_devices: int, sources: np.ndarray, receivers: np.ndarray, power: np.ndarray):
+        order = np.lexsort((sources, receivers))
+        self.sources = np.asarray(sources)[order]
+        self.power = np.asarray(power, dtype=float)[order]
+        self.indptr = np.searchsorted(np.asarray(receivers)[order], np.arange(n_devices + 1))
+
+    @classmethod
+    def from_positions(cls, x, y, transmission_power, sensitivity: float) -> "LinkBudget":
+        """Links of devices at (x, y) sending with transmission_power[i], down to sensitivity."""
+        radius = Utils.Computations.max_range(max(transmission_power), sensitivity)
+        radius *= 1 + 1e-9 # Keep the links right at the sensitivity
+        sources, receivers = GridIndex(x, y, radius).pairs_within(radius)
+        power = Utils.Computations.received_power_pairs(x, y, transmission_power, sources, receivers)
+        return cls(len(x), sources, receivers, power)
+
+    def received_power(self, sources: np.ndarray, receiver: int) -> np.ndarray:
+        """Power receiver gets from each of sources, -inf out of range."""
+        start, end = self.indptr[receiver], self.indptr[receiver + 1]
+        if start == end:
+            return np.full(len(sources), -np.inf)
+        heard_from = self.sources[start:end]
+        position = np.minimum(np.searchsorted(heard_from, sources), end - start - 1)
+        return np.where(heard_from[position] == sources, self.power[start:end][position], -np.inf)
+
+    def __len__(self) -> int:
+        return len(self.sources)
@@ -1,13 +1,22 @@
-import Metrics.Statistics
+import itertools
+import math
+import random
+from Metrics.Collector import MetricsCollector
+from Metrics.PacketLog import PacketLog
+import Utils.Checkpoint
 import Utils.Computations
+import Utils.Config
+import Utils.ResultsCache
+import Utils.TrafficModel
 from Wireless.signals import Location
 from Physics.Environment import Environment
+from Physics.Interference import make_interference_model
 from Devices.LoRaWANClassANode import LoRaWANNode
 from Devices.LoRaWANGateway import LoRaWANGateway
 from Devices.NetworkServer import  NetworkServer
-from tqdm import tqdm
+from Utils.EventScheduler import EventScheduler
+from Utils.TransmitOrder import TransmitOrder
 import numpy as np
-import json
 
 class Simulation:
 
@@ -19,28 +28,61 @@ class Simulation:
             wur_config: str = "Configurations/DUMPWuR_testing.json",
             devices_config: str = "Topology/topology.json",
             device_type = LoRaWANNode,
-            gateway_type = LoRaWANGateway
+            gateway_type = LoRaWANGateway,
+            engine: str = "event",   # "event": next-event scheduler, "tick": reference per-ms loop (per seed alike: see EventScheduler)
+            traffic_model: str = "bernoulli",   # see Utils.TrafficModel.TRAFFIC_MODELS
+            traffic_parameters: dict | None = None,
+            packet_log: str | None = None,  # .npz or .parquet file for a per-packet event log
+            interference_model: str = "capture",    # see Physics.Interference.INTERFERENCE_MODELS
+            interference_parameters: dict | None = None,
+            seed: int | None = None,    # seeds the random module, and identifies the run for results_cache
+            results_cache: str | None = None,   # directory of Utils.ResultsCache, None -> always simulate
+            join_seed: int | None = None    # seeds the join alone, the run is seeded again with seed
             ):
 
+        self.seed = seed
+        self.join_seed = join_seed
+        if join_seed is not None:
+            random.seed(join_seed)
+        elif seed is not None:
+            random.seed(seed)
+
         self.LORA_NODE_PARAMETERS = lora_config
         self.WAKE_UP_RADIO_PARAMETERS = wur_config
         self.DEVICES_PARAMETERS = devices_config
         self.environment = Environment()
+        self.interference_model = interference_model
+        self.interference_parameters = interference_parameters or {}
+        self.environment.interference = make_interference_model(interference_model, **self.interference_parameters)
         self.device_type = device_type
         self.gateway_type = gateway_type
         self.Devices = []
         self.simulation_time = simulation_time
         self.event_prob_generation = generation_prob
+        self.traffic_model = traffic_model
+        self.traffic_parameters = traffic_parameters or {}
         self.NetworkServer = NetworkServer()
+        self.metrics = MetricsCollector()
+        self.device_steps = 0     # device actions + driver calls executed, both phases
+
+        if engine not in ("event", "tick"):
+            raise ValueError(f"Unknown engine {engine!r}, expected 'event' or 'tick'")
+        self.engine = engine
 
         self.set_up_devices()
+        self.packet_log = PacketLog(packet_log, self.Devices) if packet_log else None
+        self.metrics.log = self.packet_log
+        self.results_cache = Utils.ResultsCache.ResultsCache(results_cache) if results_cache else None
+        self._results_key: str | None = None # set when results can be cached
+        self.cached_results: dict | None = None
 
     def set_up_devices(self):
-        with open(self.DEVICES_PARAMETERS, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = Utils.Config.topology(self.DEVICES_PARAMETERS)
 
         # END DEVICES
         end_devices_config = data["Nodes"]
+        traffic_parameters = Utils.TrafficModel.shared_traffic_parameters(
+            self.traffic_model, [node_config["ID"] for node_config in end_devices_config], self.traffic_parameters)
         for node_config in end_devices_config:
             node = self.device_type(node_config["ID"],
                                     self.WAKE_UP_RADIO_PARAMETERS,
@@ -48,8 +90,9 @@ class Simulation:
                                     Location(node_config["Location"]["x"], node_config["Location"]["y"]))
             node.lora.SF = node_config["default_sf"]
             node.lora.Channel = node_config["default_channel"]
-            node.lora.RSSI = node.lora.RSSIs[str(node.lora.SF)]
-            node.event_generator.probability = self.event_prob_generation
+            node.lora.RSSI = node.lora.rssi_by_sf[node.lora.SF]
+            node.event_generator = Utils.TrafficModel.make_traffic_model(
+                self.traffic_model, self.event_prob_generation, node_config["ID"], **traffic_parameters)
             self.Devices.append(node)
 
         # GATEWAYS
@@ -61,13 +104,44 @@ class Simulation:
                                     Location(node_config["Location"]["x"], node_config["Location"]["y"]), self.environment, self.NetworkServer)
             self.Devices.append(node)
 
+        # LINK BUDGET - positions are fixed for the whole run
+        for index, device in enumerate(self.Devices):
+            device.lora.index = index
+            device.wurx.index = index
+            device.lora.metrics = self.metrics
+        self.number_packets_from(1)
+        self.environment.set_link_budget(self.Devices)
+
+    def number_packets_from(self, first_id: int):
+        # One packet counter per simulation, so the IDs do not depend on earlier runs of the process
+        self.packet_ids = itertools.count(first_id)
+        for device in self.Devices:
+            device.lora.packet_ids = self.packet_ids
+
 
     def run(self):
+        if self.cached_results is not None:
+            return
         print("SIMULATION \n")
+        self.metrics.clock_offset = self.environment.time # Run phase ticks count from 0 again
+
+        if self.engine == "event":
+            self.run_events()
+        else:
+            self.run_ticks()
+
+        if self._results_key is not None:
+            self.results_cache.put(self._results_key, {"generated": self.metrics.generated,
+                                                       "delivered": self.metrics.delivered,
+                                                       "metrics": self.metrics})
 
+    def run_ticks(self):
+        from tqdm import tqdm
+
+        order = TransmitOrder(self.Devices)
         for i in tqdm(range(self.simulation_time), desc="Simulating") :
 
-            for device in Utils.Computations.sync_transmit_receive(self.Devices):
+            for device in order:
                 interrupt, wireless_signal = device.action.executable(*device.action.args)
                 self.environment.add_packet(wireless_signal)
                 self.environment.add_wake_up_beacon(wireless_signal)
@@ -75,6 +149,22 @@ class Simulation:
 
             # print(self.environment)
             self.environment.tick()
+        order.close()
+        self.device_steps += self.simulation_time * len(self.Devices)
+
+    def run_events(self):
+        from tqdm import tqdm
+
+        scheduler = EventScheduler(self.Devices, self.environment, "protocol_driver", traffic=True)
+
+        with tqdm(total=self.simulation_time, desc="Simulating") as progress:
+            while scheduler.next_time() < self.simulation_time:
+                time = scheduler.step()
+                progress.update(time + 1 - progress.n)
+            progress.update(self.simulation_time - progress.n)
+
+        scheduler.synchronize(self.simulation_time)
+        self.device_steps += scheduler.device_steps
 
     def check_if_all_nodes_have_joined(self):
         end_devices = [item for item in self.Devices if not isinstance(item, LoRaWANGateway)]
@@ -85,38 +175,104 @@ class Simulation:
 
         return True
 
-    def initialize_network(self):
+    def initialize_network(self, max_time: int | None = None, checkpoint_dir: str | None = None):
+        """
+        Run the join phase until every node joined and nothing is over the air,
+        or for at most max_time ticks.
+        With checkpoint_dir the post-join state is restored from there if the
+        same join (same network, engine, max_time and join seed) ran before, and
+        stored there otherwise; with a join_seed any load and seed shares it.
+        With a results cache holding this run, its results are loaded instead
+        and neither the join nor run() simulates anything.
+        """
+        if self.load_cached_results(max_time):
+            print("RESULTS FROM CACHE \n")
+            return
+        if checkpoint_dir is not None and (self.seed, self.join_seed) == (None, None):
+            checkpoint_dir = None # An unseeded join never happens again
+        if checkpoint_dir is not None:
+            key = Utils.Checkpoint.join_key(self, max_time)
+            if Utils.Checkpoint.restore_join(self, checkpoint_dir, key):
+                print("JOIN RESTORED \n")
+                self.seed_run()
+                return
+
         print("JOIN PROCESS \n")
 
         for device in self.Devices:
             print(str(device.lora.ID) + " " +  str(device.lora.SF))
 
+        if self.engine == "event":
+            self.initialize_network_events(max_time)
+        else:
+            self.initialize_network_ticks(max_time)
+
+        for device in self.Devices:
+            print(str(device.lora.ID) + " " +  str(device.lora.SF) + " " + str(device.joined_to_network))
+
+        if checkpoint_dir is not None and self.environment.is_idle():
+            Utils.Checkpoint.save_join(self, checkpoint_dir, key)
+        self.seed_run()
+
+    def seed_run(self):
+        """After a join under join_seed, seed the random module and the traffic models with seed."""
+        if self.join_seed is None:
+            return # One random sequence for the join and the run
+        random.seed(self.seed)
+        for device in self.Devices:
+            generator = getattr(device, "event_generator", None)
+            if generator is not None:
+                generator.reset_rng()
+
+    def join_done(self) -> bool:
+        # Only with nothing over the air, so that no frame is cut by a checkpoint
+        return self.environment.is_idle() and self.check_if_all_nodes_have_joined()
+
+    def load_cached_results(self, max_time: int | None) -> bool:
+        """Look this run up in the results cache; True, with the cached metrics in place, on a hit."""
+        if self.results_cache is None or self.seed is None or self.packet_log is not None:
+            return False # Not identifiable, or its packet log has to be written
+        self._results_key = Utils.ResultsCache.results_key(self, max_time)
+        entry = self.results_cache.get(self._results_key)
+        if entry is None:
+            return False
+        self.cached_results = entry
+        self.metrics = entry["metrics"]
+        return True
+
+    def initialize_network_ticks(self, max_time: int | None = None):
+        order = TransmitOrder(self.Devices)
         i = 0
         while True :
-            for device in Utils.Computations.sync_transmit_receive(self.Devices):
+            for device in order:
                 interrupt, wireless_signal = device.action.executable(*device.action.args)
                 self.environment.add_packet(wireless_signal)
                 self.environment.add_wake_up_beacon(wireless_signal)
                 device.join_driver(interrupt, i, self.environment)
 
             i += 1
-            if self.check_if_all_nodes_have_joined():
+            if self.join_done() or i == max_time:
                 break
 
             # print(self.environment)
             self.environment.tick()
+        order.close()
+        self.device_steps += i * len(self.Devices)
 
-        for device in self.Devices:
-            print(str(device.lora.ID) + " " +  str(device.lora.SF) + " " + str(device.joined_to_network))
+    def initialize_network_events(self, max_time: int | None = None):
+        scheduler = EventScheduler(self.Devices, self.environment, "join_driver", traffic=False)
 
-    def end_of_simulation(self):
-
-        generated_packets = 0
-        successfully_received_packets_list = []
-        for devices in self.Devices:
-            generated_packets += devices.lora.generated_packets
-            successfully_received_packets_list += devices.lora.successfully_received_packets
+        limit = math.inf if max_time is None else max_time
+        while not self.join_done():
+            if scheduler.next_time() >= limit:
+                break # Nothing left that could complete the join, or out of time
+            scheduler.step()
 
-        successfully_received_packets = len(list(dict.fromkeys(successfully_received_packets_list)))
+        scheduler.synchronize()
+        self.device_steps += scheduler.device_steps
 
-        return generated_packets, successfully_received_packets
+    def end_of_simulation(self):
+        if self.packet_log is not None:
+            self.packet_log.close()
+        # Every generated packet, and the distinct ones decoded by at least one device
+        return self.metrics.generated, self.metrics.delivered
@@ -0,0 +1,142 @@
+"""
+Parallel parameter sweeps
+=========================
+Every point of a sweep is an independent Simulation, so the points are
+sent to a process pool::
+
+    points = [{"simulation_time": 500_000, "generation_prob": p,
+               "device_type": LoRaWANNode, "gateway_type": LoRaWANGateway}
+              for p in probabilities]
+    results = run_sweep(points, seed=0)   # [(generated, received), ...]
+
+Results come back in the order of *points*. Point *i* is seeded with
+``seed + i``, so a sweep is reproducible whatever the number of workers.
+
+Monte-Carlo replications run several seeds per point, optionally adding
+seeds until the 95 % confidence interval of a statistic is narrow enough::
+
+    results = run_replications(points, replications=5, ci_target=0.01,
+                               max_replications=30)  # [[(generated, received), ...], ...]
+
+Replication *r* of point *i* is seeded with ``seed + r * len(points) + i``;
+replication 0 is the run of run_sweep.
+
+Points with a ``"checkpoint_dir"`` and a ``"join_seed"`` share one join:
+the first run simulates it and stores it there, every other load and seed
+restores it and is then seeded with its own seed (see Utils.Checkpoint).
+Before the points go to the pool each shared join is simulated once, so
+that the workers do not all join at the same time.
+Points with a ``"results_cache"`` directory are only simulated once per
+seed and code version (see Utils.ResultsCache).
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from Metrics.Statistics import mean_confidence_interval
+from Simulation import Simulation
+from Utils.Checkpoint import join_key
+
+__all__ = ["simulate", "run_point", "join_once", "run_sweep", "run_replications", "delivery_ratio"]
+
+
+def simulate(seed: int, simulation_time: int, generation_prob: float, checkpoint_dir: Optional[str] = None,
+             **simulation_kwargs) -> Simulation:
+    """
+    Join and run one Simulation and return it. With checkpoint_dir the join
+    is restored from there when it was done before, with results_cache (a
+    keyword argument of Simulation) the whole run when it was done before.
+    """
+    sim = Simulation(simulation_time, generation_prob, seed=seed, **simulation_kwargs)
+    sim.initialize_network(checkpoint_dir=checkpoint_dir)
+    sim.run()
+    return sim
+
+
+def run_point(seed: int, simulation_time: int, generation_prob: float, **kwargs) -> Tuple[int, int]:
+    """Join and run one Simulation; returns (generated, received)."""
+    return simulate(seed, simulation_time, generation_prob, **kwargs).end_of_simulation()
+
+
+def join_once(runs: List[Tuple[int, dict]]) -> None:
+    """
+    Simulate here, once, each join shared by the (seed, point) runs (same
+    checkpoint_dir and join_seed) whose results are not cached, so that the
+    workers restore it.
+    """
+    joined = set()
+    for seed, point in runs:
+        kwargs = dict(point)
+        checkpoint_dir = kwargs.pop("checkpoint_dir", None)
+        if checkpoint_dir is None or kwargs.get("join_seed") is None:
+            continue
+        sim = Simulation(seed=seed, **kwargs)
+        if sim.load_cached_results(None):
+            continue
+        key = (checkpoint_dir, join_key(sim))
+        if key not in joined:
+            joined.add(key)
+            sim.initialize_network(checkpoint_dir=checkpoint_dir)
+
+
+def run_sweep(points: List[dict], processes: Optional[int] = None, seed: int = 0) -> List[Tuple[int, int]]:
+    """
+    Run every point (keyword arguments of run_point) on *processes* workers,
+    all cores by default. processes=1 runs in this process.
+    """
+    if processes == 1:
+        return [run_point(seed + i, **point) for i, point in enumerate(points)]
+
+    join_once([(seed + i, point) for i, point in enumerate(points)])
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_point, seed + i, **point) for i, point in enumerate(points)]
+        return [future.result() for future in futures]
+
+
+def delivery_ratio(generated: int, received: int) -> float:
+    return received / generated if generated else 0.0
+
+
+def run_replications(points: List[dict], replications: int = 5, processes: Optional[int] = None, seed: int = 0,
+                     ci_target: Optional[float] = None, max_replications: Optional[int] = None,
+                     statistic: Callable[[int, int], float] = delivery_ratio) -> List[List[Tuple[int, int]]]:
+    """
+    Run *replications* seeds of every point. With *ci_target*, points whose
+    95 % CI half width of statistic(generated, received) is still wider get
+    *replications* more seeds per round, up to *max_replications*.
+    """
+    if max_replications is None:
+        max_replications = replications
+    results: List[List[Tuple[int, int]]] = [[] for _ in points]
+
+    def wanted(i: int) -> int:
+        done = len(results[i])
+        if done < replications:
+            return replications - done
+        if ci_target is None or done >= max_replications:
+            return 0
+        _, _, ci = mean_confidence_interval([statistic(*result) for result in results[i]])
+        if ci <= ci_target: # nan with a single run, more are needed
+            return 0
+        return min(replications, max_replications - done)
+
+    pool = ProcessPoolExecutor(max_workers=processes) if processes != 1 else None
+    try:
+        while True:
+            tasks = [(i, len(results[i]) + k) for i in range(len(points)) for k in range(wanted(i))]
+            if not tasks:
+                return results
+
+            seeds = [seed + r * len(points) + i for i, r in tasks]
+            if pool is None:
+                outcomes = [run_point(s, **points[i]) for s, (i, _) in zip(seeds, tasks)]
+            else:
+                join_once([(s, points[i]) for s, (i, _) in zip(seeds, tasks)])
+                futures = [pool.submit(run_point, s, **points[i]) for s, (i, _) in zip(seeds, tasks)]
+                outcomes = [future.result() for future in futures]
+            for (i, _), outcome in zip(tasks, outcomes):
+                results[i].append(outcome)
+    finally:
+        if pool is not None:
+            pool.shutdown()
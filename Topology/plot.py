@@ -1,58 +1,77 @@
 #!/usr/bin/env python3
 # plot_topology.py
+"""
+Plot a topology file, e.g. ``python -m Topology.plot --no-show``.
+Importing this module does nothing, matplotlib is only loaded by plot_topology().
+"""
+import argparse
 import json
-import matplotlib.pyplot as plt
 from pathlib import Path
 
 # ----------------------------------------------------------------------
 # Configuration
 # ----------------------------------------------------------------------
-JSON_IN   = Path("topology.json")     # path to the file you generated
-IMG_OUT   = Path("topology.png")      # output image file
-FIGSIZE   = (8, 8)                    # inches
+JSON_IN   = Path(__file__).with_name("topology.json")   # path to the file you generated
+IMG_OUT   = Path(__file__).with_name("topology.png")    # output image file
+FIGSIZE   = (8, 8)                                      # inches
 
-# ----------------------------------------------------------------------
-# Load topology
-# ----------------------------------------------------------------------
-with JSON_IN.open(encoding="utf-8") as f:
-    topo = json.load(f)
 
-nodes     = topo["Nodes"]
-gateways  = topo["Gateways"]
+def plot_topology(json_in=JSON_IN, img_out=IMG_OUT, show: bool = True) -> None:
+    import matplotlib.pyplot as plt
 
-# ----------------------------------------------------------------------
-# Extract coordinates
-# ----------------------------------------------------------------------
-node_x  = [n["Location"]["x"] for n in nodes]
-node_y  = [n["Location"]["y"] for n in nodes]
-node_id = [n["ID"]             for n in nodes]
+    # ------------------------------------------------------------------
+    # Load topology
+    # ------------------------------------------------------------------
+    with Path(json_in).open(encoding="utf-8") as f:
+        topo = json.load(f)
 
-gw_x    = [g["Location"]["x"] for g in gateways]
-gw_y    = [g["Location"]["y"] for g in gateways]
-gw_id   = [g["ID"]             for g in gateways]
+    nodes     = topo["Nodes"]
+    gateways  = topo["Gateways"]
 
-# ----------------------------------------------------------------------
-# Plot
-# ----------------------------------------------------------------------
-plt.figure(figsize=FIGSIZE)
-plt.scatter(node_x, node_y, marker="o", s=30, label="Nodes")
-plt.scatter(gw_x,   gw_y,   marker="*", s=150, label="Gateway")
-
-# annotate IDs
-for x, y, txt in zip(node_x, node_y, node_id):
-    plt.text(x, y, txt, fontsize=8, ha="left", va="bottom")
-for x, y, txt in zip(gw_x, gw_y, gw_id):
-    plt.text(x, y, f"GW{txt}", fontsize=9, ha="right", va="top",
-             fontweight="bold")
-
-plt.title("LoRa Topology")
-plt.xlabel("x [m]")
-plt.ylabel("y [m]")
-plt.gca().set_aspect("equal", adjustable="box")
-plt.grid(True)
-plt.legend()
-
-# save and show
-plt.savefig(IMG_OUT, dpi=300, bbox_inches="tight")
-print(f"Saved figure to {IMG_OUT.resolve()}")
-plt.show()
+    # ------------------------------------------------------------------
+    # Extract coordinates
+    # ------------------------------------------------------------------
+    node_x  = [n["Location"]["x"] for n in nodes]
+    node_y  = [n["Location"]["y"] for n in nodes]
+    node_id = [n["ID"]             for n in nodes]
+
+    gw_x    = [g["Location"]["x"] for g in gateways]
+    gw_y    = [g["Location"]["y"] for g in gateways]
+    gw_id   = [g["ID"]             for g in gateways]
+
+    # ------------------------------------------------------------------
+    # Plot
+    # ------------------------------------------------------------------
+    plt.figure(figsize=FIGSIZE)
+    plt.scatter(node_x, node_y, marker="o", s=30, label="Nodes")
+    plt.scatter(gw_x,   gw_y,   marker="*", s=150, label="Gateway")
+
+    # annotate IDs
+    for x, y, txt in zip(node_x, node_y, node_id):
+        plt.text(x, y, txt, fontsize=8, ha="left", va="bottom")
+    for x, y, txt in zip(gw_x, gw_y, gw_id):
+        plt.text(x, y, f"GW{txt}", fontsize=9, ha="right", va="top",
+                 fontweight="bold")
+
+    plt.title("LoRa Topology")
+    plt.xlabel("x [m]")
+    plt.ylabel("y [m]")
+    plt.gca().set_aspect("equal", adjustable="box")
+    plt.grid(True)
+    plt.legend()
+
+    # save and show
+    if img_out is not None:
+        plt.savefig(img_out, dpi=300, bbox_inches="tight")
+        print(f"Saved figure to {Path(img_out).resolve()}")
+    if show:
+        plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot a topology file")
+    parser.add_argument("json_in", nargs="?", default=JSON_IN)
+    parser.add_argument("--out", default=IMG_OUT, help="image file to save")
+    parser.add_argument("--no-show", action="store_true", help="only save the image")
+    args = parser.parse_args()
+    plot_topology(args.json_in, args.out, show=not args.no_show)
@@ -0,0 +1,161 @@
+"""
+Checkpoints of a joined network
+===============================
+The outcome of the join phase is stored once and restored by later runs
+that join the same network::
+
+    key = join_key(sim, max_time)
+    if not restore_join(sim, "Checkpoints", key):
+        sim.initialize_network(max_time)
+        save_join(sim, "Checkpoints", key)
+
+(Simulation.initialize_network(checkpoint_dir=...) does exactly this.)
+
+The join draws no traffic, so it does not depend on the load: the key
+hashes the topology, radio configurations, device classes, interference
+model, engine, join limit, the join seed (the seed without one) and the
+simulator code version. Runs with a join_seed, e.g. every load and
+replication of a sweep, share one join: it is simulated by the first of
+them and restored by the others, and each run is seeded with its own seed
+after the join (Simulation.seed_run). A restored run gives the same results
+as the same run joining by itself.
+
+The join only ends with nothing over the air, so no frame is in flight (a
+join stopped by max_time with frames over the air is not stored). A
+checkpoint holds, per device, the protocol state and its timer, the
+spreading factor, channel and joined flag, the radio buffers and receptions,
+the gateway demodulator paths, and the multihop relay node, hop depth and
+cluster channel; plus the join duration, the state of the random module,
+the next packet ID, the network server tables and the metrics collected
+while joining.
+
+An unreadable checkpoint is deleted and the join simulated again.
+Checkpoints are pickles and loading one can run code: only use a
+checkpoint directory written by trusted users.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import random
+import tempfile
+import zlib
+from pathlib import Path
+
+from Utils.ResultsCache import code_version
+
+__all__ = ["join_key", "save_join", "restore_join"]
+
+FORMAT_VERSION = 5
+
+DEVICE_FIELDS = ("state", "joined_to_network", "joined_network_id", "relay_node", "hop_depth",
+                 "cluster_channel", "sensing_counter", "seq_no", "receiving_windows_enabled")
+LORA_FIELDS = ("SF", "Channel", "RSSI", "counter", "generated_packets", "TX_Buffer", "RX_Buffer",
+               "tx_ticks_left", "receptions")
+WURX_FIELDS = ("TX_Buffer", "IRQ", "_latency_counter")
+RECEIVER_FIELDS = ("locked", "last_tick", "lost_no_path")
+
+
+def join_key(simulation, max_time: int | None = None) -> str:
+    """Hash of everything the join depends on; the same for every load and run seed under one join seed."""
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}-{code_version()}".encode())
+    for path in (simulation.DEVICES_PARAMETERS, simulation.LORA_NODE_PARAMETERS,
+                 simulation.WAKE_UP_RADIO_PARAMETERS):
+        digest.update(Path(path).read_bytes())
+    for cls in (simulation.device_type, simulation.gateway_type):
+        digest.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+    join_seed = simulation.seed if simulation.join_seed is None else simulation.join_seed
+    parameters = [simulation.interference_model, simulation.interference_parameters, simulation.engine,
+                  max_time, join_seed]
+    digest.update(json.dumps(parameters, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()[:32]
+
+
+def _path(directory, key: str) -> Path:
+    return Path(directory) / f"join-{key}.pkl.gz"
+
+
+def _fields(obj, names) -> dict:
+    return {name: getattr(obj, name) for name in names if hasattr(obj, name)}
+
+
+def save_join(simulation, directory, key: str) -> Path:
+    """Store the post-join state of *simulation*; written atomically, concurrent writers are harmless."""
+    if not simulation.environment.is_idle():
+        raise RuntimeError("Cannot checkpoint a join with frames over the air")
+    devices = []
+    for device in simulation.Devices:
+        receiver = getattr(device, "receiver", None)
+        devices.append((device.lora.ID,
+                        _fields(device, DEVICE_FIELDS),
+                        _fields(device.lora, LORA_FIELDS),
+                        _fields(device.wurx, WURX_FIELDS),
+                        _fields(receiver, RECEIVER_FIELDS) if receiver is not None else {}))
+    packet_id = next(simulation.packet_ids)
+    simulation.number_packets_from(packet_id) # Not used up: the run goes on as a restored one
+    checkpoint = {
+        "version": FORMAT_VERSION,
+        "time": simulation.environment.time,
+        "random": random.getstate(),
+        "packet_id": packet_id,
+        "devices": devices,
+        "network_server": vars(simulation.NetworkServer),
+        "metrics": simulation.metrics,
+    }
+
+    path = _path(directory, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(temporary, 0o644) # mkstemp creates it private
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return path
+
+
+def restore_join(simulation, directory, key: str) -> bool:
+    """Put a freshly set up *simulation* in its stored post-join state; False if there is no checkpoint."""
+    path = _path(directory, key)
+    try:
+        with gzip.open(path, "rb") as f:
+            checkpoint = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+        path.unlink(missing_ok=True) # Corrupt or truncated, e.g. by an interrupted writer: join again
+        return False
+    if checkpoint.get("version") != FORMAT_VERSION:
+        return False
+
+    devices = {device.lora.ID: device for device in simulation.Devices}
+    if sorted(devices) != sorted(stored[0] for stored in checkpoint["devices"]):
+        raise ValueError(f"Checkpoint {path} does not match the devices of the topology")
+
+    environment = simulation.environment
+    environment.skip(checkpoint["time"])
+    for ID, device_fields, lora_fields, wurx_fields, receiver_fields in checkpoint["devices"]:
+        device = devices[ID]
+        for obj, fields in ((device, device_fields), (device.lora, lora_fields), (device.wurx, wurx_fields),
+                            (getattr(device, "receiver", None), receiver_fields)):
+            for name, value in fields.items():
+                setattr(obj, name, value)
+        if device.state is not None:
+            device.enter(device.state, environment.time, environment)
+    random.setstate(checkpoint["random"])
+    simulation.number_packets_from(checkpoint["packet_id"])
+
+    vars(simulation.NetworkServer).update(checkpoint["network_server"])
+    metrics = checkpoint["metrics"]
+    metrics.clock_offset = simulation.metrics.clock_offset
+    metrics.log = simulation.metrics.log
+    simulation.metrics = metrics
+    for device in simulation.Devices:
+        device.lora.metrics = metrics
+    return True
@@ -1,5 +1,12 @@
+import functools
 import math
 import hashlib
+import numpy as np
+
+# Path loss model constants - sensors-22-03518-v3.pdf - reference
+PLd0 = 37  # Reference path loss at the reference distance (d0)
+d0 = 1.0  # Reference distance (1 meter)
+alpha = 2.5  # Path loss exponent - (2-4) - urban enviroments ~ 3
 
 def compute_payload_size(payload: dict) -> int:
     payload_size: int = 0
@@ -8,7 +15,7 @@ def compute_payload_size(payload: dict) -> int:
 
     return payload_size
 
-def toa(payload_size: int, sf: int, bw: int = 125, crc: int =1, header: int =0, de: int =0, n_preamble: int =8, cr: int =1) -> int:
+def _toa(payload_size: int, sf: int, bw: int = 125, crc: int =1, header: int =0, de: int =0, n_preamble: int =8, cr: int =1) -> float:
     # The LowDataRateOptimize is enabled fo bandwidth 125 kHz and Spreading Factor >= 11
     if bw == 125 and int(sf) >= 11: de = 1
 
@@ -18,11 +25,11 @@ def toa(payload_size: int, sf: int, bw: int = 125, crc: int =1, header: int =0,
     # Time of payload - include header crc and low data range optimization
     num_payload_symbols = 8 + max(math.ceil((8.0 * payload_size - 4.0 * int(sf) + 28.0 + 16.0 * crc - 20.0 * header) / (4.0 * (int(sf) - 2.0 * de))) * (cr + 4), 0)
     time_of_payload = time_of_symbol * num_payload_symbols
-    time_of_preamble = preamble_time(sf, bw, n_preamble)
+    time_of_preamble = _preamble_time(sf, bw, n_preamble)
 
     return time_of_preamble + time_of_payload
 
-def preamble_time(sf: int, bw: int = 125, n_preamble: int =8) -> int:
+def _preamble_time(sf: int, bw: int = 125, n_preamble: int =8) -> float:
     # Time of symbol (ms)
     time_of_symbol = (2 ** int(sf)) / bw
     time_of_preamble = (n_preamble + 4.25) * time_of_symbol
@@ -30,11 +37,33 @@ def preamble_time(sf: int, bw: int = 125, n_preamble: int =8) -> int:
     return time_of_preamble
 
 
+# Airtime only depends on (payload bytes, SF, BW, CR, header, DE): precomputed for the
+# default radio settings, [sf - 7][payload bytes], memoized for any other combination
+MAX_PAYLOAD_SIZE = 255
+TOA_TABLE = [[_toa(size, sf) for size in range(MAX_PAYLOAD_SIZE + 1)] for sf in range(7, 13)]
+PREAMBLE_TABLE = [_preamble_time(sf) for sf in range(7, 13)]
+
+_toa_cached = functools.lru_cache(maxsize=1024)(_toa)
+_preamble_time_cached = functools.lru_cache(maxsize=64)(_preamble_time)
+
+def toa(payload_size: int, sf: int, bw: int = 125, crc: int =1, header: int =0, de: int =0, n_preamble: int =8, cr: int =1) -> float:
+    if (bw == 125 and crc == 1 and header == 0 and de == 0 and n_preamble == 8 and cr == 1
+            and 7 <= sf <= 12 and 0 <= payload_size <= MAX_PAYLOAD_SIZE):
+        return TOA_TABLE[sf - 7][payload_size]
+    return _toa_cached(payload_size, sf, bw, crc, header, de, n_preamble, cr)
+
+def preamble_time(sf: int, bw: int = 125, n_preamble: int =8) -> float:
+    if bw == 125 and n_preamble == 8 and 7 <= sf <= 12:
+        return PREAMBLE_TABLE[sf - 7]
+    return _preamble_time_cached(sf, bw, n_preamble)
+
+
+def airtime_ticks(time_over_air: float) -> int:
+    # Number of 1 ms ticks a frame occupies the channel
+    return max(1, math.ceil(time_over_air))
+
+
 def calculate_received_power(distance:float, transmission_power: int, shadowing_std_dev: float=6.0):
-    # Constants - sensors-22-03518-v3.pdf - reference
-    PLd0 = 37  # Reference path loss at the reference distance (d0)
-    d0 = 1.0  # Reference distance (1 meter)
-    alpha = 2.5  # Path loss exponent - (2-4) - urban enviroments ~ 3
     # Calculate the path loss without shadowing
     try:
         PL = PLd0 + 10 * alpha * math.log10(distance / d0)
@@ -50,6 +79,25 @@ def calculate_received_power(distance:float, transmission_power: int, shadowing_
     return Pr
 
 
+def received_power_pairs(x, y, transmission_power, sources, receivers, shadowing_std_dev: float = 6.0) -> np.ndarray:
+    """
+    Same model as calculate_received_power for many links at once: power (dBm)
+    receivers[k] gets from sources[k] transmitting with transmission_power[sources[k]].
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    distances = np.hypot(x[sources] - x[receivers], y[sources] - y[receivers])
+
+    with np.errstate(divide="ignore"):
+        path_loss = PLd0 + 10 * alpha * np.log10(distances / d0) + shadowing_std_dev
+    return np.asarray(transmission_power, dtype=float)[sources] - path_loss
+
+
+def max_range(transmission_power: float, sensitivity: float, shadowing_std_dev: float = 6.0) -> float:
+    # Distance at which the received power falls to the sensitivity, inverse of calculate_received_power
+    return d0 * 10 ** ((transmission_power - sensitivity - PLd0 - shadowing_std_dev) / (10 * alpha))
+
+
 def distance(location1, location2) -> float:
     x1, y1, z1 = location1.x, location1.y, 0
     x2, y2, z2 = location2.x, location2.y, 0
@@ -57,24 +105,6 @@ def distance(location1, location2) -> float:
     distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2 + (z2 - z1) ** 2)
     return distance
 
-# Use this function to sort nodes.
-# nodes where its action is transmit goes first.
-def sync_transmit_receive(devices):
-    tx_list, other = [], []
-
-    TX_FUNC     = devices[0].lora.__class__.transmit_packet
-    TX_WUR_FUNC = devices[0].wurx.__class__.transmit_beacon
-
-    for dev in devices:                      # single pass
-        exec_ = getattr(dev.action, "executable", None)
-        func  = getattr(exec_, "__func__", None)  # underlying function
-        if func in (TX_FUNC, TX_WUR_FUNC):
-            tx_list.append(dev)
-        else:
-            other.append(dev)
-
-    return tx_list + other                   # new ordering
-
 # Get unique delays for nodes for join request transmission
 def spaced_delay_from_id(node_id: str, step=1000) -> int:
     # Hash the string ID into a large integer
@@ -0,0 +1,103 @@
+"""
+Parameter files, parsed once per process
+=========================================
+Every device of a run (and every run of a sweep in the same process) shares
+the same immutable parameter objects; per-device state stays on the radios::
+
+    parameters = lora_parameters("Configurations/LoRaNodeParameters.json")
+    parameters.rssi_by_sf[12]    # -137
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+__all__ = ["LoRaParameters", "WuRParameters", "lora_parameters", "wur_parameters", "topology"]
+
+SPREADING_FACTORS = range(7, 13)
+
+
+@dataclass(frozen=True)
+class LoRaParameters:
+    sf: int
+    channel: int
+    bandwidth: int
+    power_tx: float
+    rssi_by_sf: Mapping[int, float]     # sensitivity (dBm) per SF
+    rssis: Mapping[str, float]          # same, keyed by str(SF) as in LoRaModule.RSSIs
+
+
+@dataclass(frozen=True)
+class WuRParameters:
+    center_frequency_MHz: float
+    bandwidth_MHz: float
+    modulation: str
+    code_length_bits: int
+    sensitivity_dBm: float
+    latency_ms: int
+    transmission_power_dBm: float
+    false_alarm_rate_per_hour: str
+    missed_detection_ratio_at_sensitivity: str
+
+
+def _key(path: str) -> str:
+    return os.path.abspath(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _lora_parameters(path: str) -> LoRaParameters:
+    with open(path) as f:
+        parameters = json.load(f)
+
+    rssi_by_sf = {sf: parameters[f"RSSI_sf{sf}"] for sf in SPREADING_FACTORS}
+    return LoRaParameters(
+        sf=parameters["sf"],
+        channel=parameters["channel"],
+        bandwidth=parameters["bandwidth"],
+        power_tx=parameters["PowerTX"],
+        rssi_by_sf=MappingProxyType(rssi_by_sf),
+        rssis=MappingProxyType({str(sf): rssi for sf, rssi in rssi_by_sf.items()}),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _wur_parameters(path: str) -> WuRParameters:
+    with open(path) as f:
+        p = json.load(f)
+
+    return WuRParameters(
+        center_frequency_MHz=p["center_frequency_MHz"],
+        bandwidth_MHz=p["bandwidth_MHz"],
+        modulation=p["modulation"],
+        code_length_bits=p["code_length_bits"],
+        sensitivity_dBm=p["sensitivity_dBm"],
+        latency_ms=p["latency_ms"],
+        transmission_power_dBm=p["transmission_power_dBm"],
+        false_alarm_rate_per_hour=p["false_alarm_rate_per_hour"],
+        missed_detection_ratio_at_sensitivity=p["missed_detection_ratio_at_sensitivity"],
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _topology(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def lora_parameters(path: str) -> LoRaParameters:
+    """LoRa radio parameters (LoRaNodeParameters.json format)."""
+    return _lora_parameters(_key(path))
+
+
+def wur_parameters(path: str) -> WuRParameters:
+    """Wake-up radio parameters (MangalKingetWuR.json format)."""
+    return _wur_parameters(_key(path))
+
+
+def topology(path: str) -> dict:
+    """Parsed topology file (Nodes / Gateways), shared: do not modify."""
+    return _topology(_key(path))
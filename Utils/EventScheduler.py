@@ -0,0 +1,124 @@
+import heapq
+import math
+
+
+class EventScheduler:
+    """
+    Next-event engine with the same per-tick semantics as the reference loop.
+    With the same seed both engines give the same join, and the same run
+    with trace arrivals; random traffic models draw their arrivals in
+    another order than the per-tick draws of the reference loop, so the runs
+    agree in distribution, not per seed.
+
+    Every device is kept in a priority queue keyed by the next tick at which it
+    has to run (delay expiring, packet generation, end of a transmitted frame,
+    traffic arrival, ...).
+    On a tick only the due devices run, transmitters first, plus every
+    listening device while LoRa packets are over the air. Ticks in which no
+    device is due and nothing is over the air are skipped; idle devices catch
+    up on their skipped ticks (counter decrements) when they run next.
+    """
+
+    def __init__(self, devices, environment, driver: str = "protocol_driver", traffic: bool = True,
+                 start_time: int = 0):
+        self.devices = devices
+        self.environment = environment
+        self.driver = driver            # name of the device method driving the protocol
+        self.traffic = traffic          # sleeping devices wake on traffic arrivals
+        self.time = start_time          # next tick to execute
+
+        self._queue = []                # (tick, device index, version)
+        self._version = [0] * len(devices)
+        self._last_run = [start_time - 1] * len(devices)
+        self._listening = set()
+        self.device_steps = 0           # devices run so far
+
+        for index in range(len(devices)):
+            self._schedule(index, start_time)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def next_time(self) -> float:
+        """Tick of the next step; math.inf if no device will ever run again."""
+        if not self.environment.is_idle():
+            return self.time
+        while self._queue and self._queue[0][2] != self._version[self._queue[0][1]]:
+            heapq.heappop(self._queue) # outdated entry
+        if not self._queue:
+            return math.inf
+        return max(self.time, self._queue[0][0])
+
+    def step(self) -> int:
+        """Run the next tick in which something happens and return it."""
+        time = self.next_time()
+        if time == math.inf:
+            raise RuntimeError("No scheduled events left")
+
+        if time > self.time:
+            self.environment.skip(time - self.time)
+
+        due = set()
+        while self._queue and self._queue[0][0] <= time:
+            _, index, version = heapq.heappop(self._queue)
+            if version == self._version[index]:
+                due.add(index)
+
+        transmitters = sorted(index for index in due if self.devices[index].is_transmitting())
+        for index in transmitters:
+            self._run_device(index, time)
+
+        others = due
+        if self.environment.has_lora_packets():
+            others |= self._listening
+        others.difference_update(transmitters) # A device runs once per tick
+        for index in sorted(others):
+            self._run_device(index, time)
+
+        self.environment.tick()
+        self.time = time + 1
+        return time
+
+    def synchronize(self, until: int | None = None) -> None:
+        """
+        Bring every idle device up to date, e.g. before handing them to another phase.
+        until: first tick not yet simulated, must not be past next_time().
+        """
+        if until is not None and until > self.time:
+            self.environment.skip(until - self.time)
+            self.time = until
+        for index, device in enumerate(self.devices):
+            skipped = self.time - self._last_run[index] - 1
+            if skipped > 0:
+                device.skip_ticks(skipped)
+            self._last_run[index] = self.time - 1
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _run_device(self, index: int, time: int) -> None:
+        device = self.devices[index]
+        skipped = time - self._last_run[index] - 1
+        if skipped > 0:
+            device.skip_ticks(skipped)
+        self._last_run[index] = time
+        self.device_steps += 1
+
+        interrupt, wireless_signal = device.action.executable(*device.action.args)
+        self.environment.add_packet(wireless_signal)
+        self.environment.add_wake_up_beacon(wireless_signal)
+        getattr(device, self.driver)(interrupt, time, self.environment)
+
+        self._schedule(index, time + 1)
+
+    def _schedule(self, index: int, time: int) -> None:
+        device = self.devices[index]
+        if device.is_listening():
+            self._listening.add(index)
+        else:
+            self._listening.discard(index)
+
+        self._version[index] += 1
+        wakeup = device.next_wakeup(time, self.traffic)
+        if wakeup != math.inf:
+            heapq.heappush(self._queue, (wakeup, index, self._version[index]))
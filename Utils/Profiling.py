@@ -0,0 +1,208 @@
+"""
+Opt-in profiling of simulation runs
+===================================
+Nothing is instrumented unless a Profiler is active. Inside the ``with``
+block the hot-path methods are replaced at class level by timed wrappers,
+and the originals are put back on exit::
+
+    with Profiler(cprofile=True) as profiler:
+        sim = Simulation(100_000, 0.004)      # create the devices inside the block
+        sim.initialize_network()
+        sim.run()
+
+    profiler.save_json("profile.json")        # per-phase / per-function timers, counters
+    profiler.dump_stats("profile.pstats")     # cProfile data, e.g. for snakeviz
+
+From the command line::
+
+    python -m Utils.Profiling --time 100000 --prob 0.004 --json profile.json --pstats profile.pstats
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import functools
+import json
+import time
+from collections import defaultdict
+
+__all__ = ["Profiler"]
+
+
+def _targets() -> list:
+    """(class, method name) pairs timed by the profiler."""
+    from Devices.LoRaWANClassANode import LoRaWANNode
+    from Devices.LoRaWANGateway import LoRaWANGateway
+    from Devices.Multihop1Node import Multihop1Node
+    from Hardware.GatewayReceiver import GatewayReceiver
+    from Hardware.LoRaModule import LoRaModule
+    from Physics.Environment import Environment
+
+    return [
+        (LoRaModule, "receive_packets_partial"),
+        (LoRaModule, "transmit_packet"),
+        (Environment, "tick"),
+        (LoRaWANGateway, "multiple_input"),
+        (GatewayReceiver, "frame_started"),
+        (LoRaWANNode, "protocol_driver"),
+        (LoRaWANNode, "join_driver"),
+        (Multihop1Node, "protocol_driver"),
+        (Multihop1Node, "join_driver"),
+        (LoRaWANGateway, "protocol_driver"),
+        (LoRaWANGateway, "join_driver"),
+    ]
+
+
+DRIVERS = ("protocol_driver", "join_driver")
+PHASES = {"initialize_network": "join", "run": "run"}
+
+
+class Profiler:
+    """Per-phase timers, per-function timers, per-device-class driver call counters."""
+
+    def __init__(self, cprofile: bool = False):
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.timers = defaultdict(lambda: [0, 0])           # "Class.method" -> [calls, ns] (inclusive)
+        self.driver_calls = defaultdict(lambda: defaultdict(int)) # device class -> driver -> calls
+        self.phases = {}                                    # phase -> wall time, simulated ticks, events
+        self._originals = []
+
+    # ------------------------------------------------------------------
+    # Activation
+    # ------------------------------------------------------------------
+    def __enter__(self) -> "Profiler":
+        from Simulation import Simulation
+
+        for cls, name in _targets():
+            original = cls.__dict__[name]
+            self._originals.append((cls, name, original))
+            wrapper = self._driver(original, name) if name in DRIVERS else self._timed(original, f"{cls.__name__}.{name}")
+            setattr(cls, name, wrapper)
+        for name, phase in PHASES.items():
+            original = Simulation.__dict__[name]
+            self._originals.append((Simulation, name, original))
+            setattr(Simulation, name, self._phase(original, phase))
+
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals.clear()
+
+    # ------------------------------------------------------------------
+    # Wrappers
+    # ------------------------------------------------------------------
+    def _timed(self, function, key: str):
+        timer = self.timers[key]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer[0] += 1
+                timer[1] += time.perf_counter_ns() - start
+        return wrapper
+
+    def _driver(self, function, name: str):
+        driver_calls = self.driver_calls
+        timers = self.timers
+
+        @functools.wraps(function)
+        def wrapper(device, *args, **kwargs):
+            cls = type(device).__name__
+            driver_calls[cls][name] += 1
+            timer = timers[f"{cls}.{name}"]
+            start = time.perf_counter_ns()
+            try:
+                return function(device, *args, **kwargs)
+            finally:
+                timer[0] += 1
+                timer[1] += time.perf_counter_ns() - start
+        return wrapper
+
+    def _phase(self, function, phase: str):
+        phases = self.phases
+        driver_calls = self.driver_calls
+
+        @functools.wraps(function)
+        def wrapper(simulation, *args, **kwargs):
+            events_before = sum(sum(calls.values()) for calls in driver_calls.values())
+            ticks_before = simulation.environment.time
+            start = time.perf_counter()
+            try:
+                return function(simulation, *args, **kwargs)
+            finally:
+                wall = time.perf_counter() - start
+                events = sum(sum(calls.values()) for calls in driver_calls.values()) - events_before
+                record = phases.setdefault(phase, {"wall_s": 0.0, "simulated_ms": 0, "events": 0})
+                record["wall_s"] += wall
+                record["simulated_ms"] += simulation.environment.time - ticks_before
+                record["events"] += events
+        return wrapper
+
+    # ------------------------------------------------------------------
+    # Reports
+    # ------------------------------------------------------------------
+    def report(self) -> dict:
+        """Plain dict, events being device steps (driver calls)."""
+        phases = {}
+        for phase, record in self.phases.items():
+            wall = record["wall_s"]
+            phases[phase] = dict(record,
+                                 events_per_s=record["events"] / wall if wall else 0.0,
+                                 simulated_ms_per_s=record["simulated_ms"] / wall if wall else 0.0)
+        functions = {key: {"calls": calls, "total_s": ns / 1e9, "mean_us": ns / calls / 1e3 if calls else 0.0}
+                     for key, (calls, ns) in sorted(self.timers.items(), key=lambda item: -item[1][1]) if calls}
+        return {
+            "phases": phases,
+            "functions": functions,   # inclusive times, e.g. transmit_packet also counts frame_started
+            "driver_calls": {cls: dict(calls) for cls, calls in self.driver_calls.items()},
+        }
+
+    def save_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def dump_stats(self, path: str) -> None:
+        if self.cprofile is None:
+            raise RuntimeError("Profiler created without cprofile=True")
+        self.cprofile.dump_stats(path)
+
+
+def main(argv=None) -> None:
+    import random
+    from Simulation import Simulation
+
+    parser = argparse.ArgumentParser(description="Profile one join + run of the simulator")
+    parser.add_argument("--time", type=int, default=100_000, help="simulated ms of the run phase")
+    parser.add_argument("--prob", type=float, default=0.004, help="generation probability per node per ms")
+    parser.add_argument("--topology", default="Topology/topology.json")
+    parser.add_argument("--engine", default="event", choices=("event", "tick"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the timer report here")
+    parser.add_argument("--pstats", help="also run cProfile and dump its stats here")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    with Profiler(cprofile=args.pstats is not None) as profiler:
+        sim = Simulation(args.time, args.prob, devices_config=args.topology, engine=args.engine)
+        sim.initialize_network()
+        sim.run()
+
+    report = profiler.report()
+    if args.json:
+        profiler.save_json(args.json)
+    if args.pstats:
+        profiler.dump_stats(args.pstats)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Cache of simulation results
+===========================
+A run is fully determined by its inputs, so its results can be kept on disk
+and returned instead of simulating the same point again::
+
+    sim = Simulation(500_000, p, seed=3, results_cache="Cache")
+    sim.initialize_network()   # on a hit: loads the results, simulates nothing
+    sim.run()
+    sim.end_of_simulation()    # (generated, delivered), sim.metrics as after the run
+
+The key hashes the contents of the topology, LoRa and WuR configuration
+files (and of files named in the traffic parameters, e.g. traces), the
+device class names, the simulation parameters, the join limit and the
+seeds. A join restored from a checkpoint is identical to a fresh one (see
+Utils.Checkpoint), so restored and fresh runs share their entries. Entries
+are grouped by code version, a hash of the simulator sources: after any
+change of the code no old entry is hit, and ``python -m Utils.ResultsCache
+--prune`` deletes them.
+
+Once the cache exceeds max_bytes the least recently used entries are
+deleted, and unreadable entries are deleted when they are looked up. Runs
+without a seed, or writing a packet log, are not cached. Entries are
+pickles and loading one can run code: only use a cache directory written
+by trusted users.
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+__all__ = ["ResultsCache", "results_key", "code_version"]
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 1 << 30
+
+ROOT = Path(__file__).resolve().parent.parent
+# Sources the results depend on
+CODE = ("Simulation.py", "Devices", "Hardware", "Metrics", "Physics", "Utils", "Wireless")
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    """Hash of the simulator sources."""
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}".encode())
+    for name in CODE:
+        path = ROOT / name
+        for source in sorted(path.rglob("*.py")) if path.is_dir() else [path]:
+            digest.update(str(source.relative_to(ROOT)).encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def _file_contents(value, digest) -> None:
+    """Hash the files named in (nested) parameters, so edited traces change the key."""
+    if isinstance(value, dict):
+        for item in value.values():
+            _file_contents(item, digest)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _file_contents(item, digest)
+    elif isinstance(value, str) and os.path.isfile(value):
+        digest.update(Path(value).read_bytes())
+
+
+def results_key(simulation, max_time: int | None) -> str:
+    """Hash of everything the results of *simulation* depend on, the code aside."""
+    digest = hashlib.sha256()
+    for path in (simulation.DEVICES_PARAMETERS, simulation.LORA_NODE_PARAMETERS,
+                 simulation.WAKE_UP_RADIO_PARAMETERS):
+        digest.update(Path(path).read_bytes())
+    parameters = {
+        "device_type": f"{simulation.device_type.__module__}.{simulation.device_type.__qualname__}",
+        "gateway_type": f"{simulation.gateway_type.__module__}.{simulation.gateway_type.__qualname__}",
+        "simulation_time": simulation.simulation_time,
+        "generation_prob": simulation.event_prob_generation,
+        "engine": simulation.engine,
+        "traffic_model": simulation.traffic_model,
+        "traffic_parameters": simulation.traffic_parameters,
+        "interference_model": simulation.interference_model,
+        "interference_parameters": simulation.interference_parameters,
+        "seed": simulation.seed,
+        "join_seed": simulation.join_seed,
+        "max_time": max_time,
+    }
+    digest.update(json.dumps(parameters, sort_keys=True, default=repr).encode())
+    _file_contents(simulation.traffic_parameters, digest)
+    return digest.hexdigest()[:32]
+
+
+class ResultsCache:
+    """Directory of results, one gzip pickle per run, under a subdirectory per code version."""
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / code_version() / f"{key}.pkl.gz"
+
+    def get(self, key: str) -> dict | None:
+        """Stored results of *key*, or None."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            path.unlink(missing_ok=True) # Corrupt or truncated, e.g. by an interrupted writer: a miss
+            return None
+        if entry.get("version") != FORMAT_VERSION:
+            return None
+        os.utime(path) # Recently used, evicted last
+        return entry
+
+    def put(self, key: str, entry: dict) -> Path:
+        """Store *entry* under *key* (written atomically), then evict down to max_bytes."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                pickle.dump({"version": FORMAT_VERSION, **entry}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.chmod(temporary, 0o644) # mkstemp creates it private
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
+        return path
+
+    def entries(self) -> list:
+        """(last use, size, path) of every entry, any code version, oldest first."""
+        entries = []
+        for path in self.directory.glob("*/*.pkl.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError: # Evicted by a concurrent run
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits max_bytes; returns how many."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def prune(self) -> int:
+        """Delete the entries of every other code version; returns how many."""
+        pruned = 0
+        if not self.directory.is_dir():
+            return 0
+        for version in self.directory.iterdir():
+            if version.is_dir() and version.name != code_version():
+                pruned += len(list(version.glob("*.pkl.gz")))
+                shutil.rmtree(version, ignore_errors=True)
+        return pruned
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or clean a results cache")
+    parser.add_argument("directory", nargs="?", default="Cache")
+    parser.add_argument("--prune", action="store_true", help="delete the entries of older code versions")
+    parser.add_argument("--max-mb", type=float, help="evict least recently used entries down to this size")
+    parser.add_argument("--clear", action="store_true", help="delete every entry")
+    args = parser.parse_args(argv)
+
+    cache = ResultsCache(args.directory)
+    if args.clear:
+        cache.clear()
+    if args.prune:
+        print(f"Pruned {cache.prune()} entries of older code versions")
+    if args.max_mb is not None:
+        cache.max_bytes = int(args.max_mb * 2**20)
+        print(f"Evicted {cache.evict()} entries")
+    entries = cache.entries()
+    current = sum(path.parent.name == code_version() for _, _, path in entries)
+    print(f"{args.directory}: {len(entries)} entries ({current} of code version {code_version()}), "
+          f"{sum(size for _, size, _ in entries) / 2**20:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
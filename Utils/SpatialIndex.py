@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid over device positions, cells of side cell_size. Pairs of
+    devices closer than cell_size are found by comparing each cell with its
+    eight neighbours only, O(N * devices per cell) instead of O(N²).
+    """
+
+    def __init__(self, x, y, cell_size: float):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.cell_size = float(cell_size)
+
+        self.cells: dict = {} # (cell x, cell y) -> device indices
+        cell_x = np.floor(self.x / self.cell_size).astype(np.int64)
+        cell_y = np.floor(self.y / self.cell_size).astype(np.int64)
+        for index, cell in enumerate(zip(cell_x.tolist(), cell_y.tolist())):
+            self.cells.setdefault(cell, []).append(index)
+        self.cells = {cell: np.array(indices) for cell, indices in self.cells.items()}
+
+    def pairs_within(self, radius: float):
+        """(i, j) index arrays of every ordered pair of distinct devices at most radius apart."""
+        if radius > self.cell_size:
+            raise ValueError("radius larger than the grid cell")
+
+        first, second = [], []
+        for (cx, cy), indices in self.cells.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbours = self.cells.get((cx + dx, cy + dy))
+                    if neighbours is None:
+                        continue
+                    distance = np.hypot(self.x[indices, None] - self.x[None, neighbours],
+                                        self.y[indices, None] - self.y[None, neighbours])
+                    close = (distance <= radius) & (indices[:, None] != neighbours[None, :])
+                    i, j = np.nonzero(close)
+                    first.append(indices[i])
+                    second.append(neighbours[j])
+
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(first), np.concatenate(second)
@@ -0,0 +1,50 @@
+from typing import Callable, NamedTuple, Optional
+
+ANY = None # Event key of the transitions taken whatever the interrupt is
+
+
+class Transition(NamedTuple):
+    target: int                                 # state entered
+    guard: Optional[Callable] = None            # guard(device, time) -> bool
+    effect: Optional[Callable] = None           # effect(device), after entering the target
+
+
+class StateMachine:
+    """
+    Transition table of a protocol driver: (state, event) -> transitions,
+    tried in order, the first one whose guard holds is taken. When the event
+    has no entry the (state, ANY) transitions are tried.
+    At most one transition is taken per call.
+    """
+
+    def __init__(self, transitions: dict):
+        self.transitions = transitions
+
+    def dispatch(self, device, event, time: int, environment) -> None:
+        state = device.state
+        rules = self.transitions.get((state, event))
+        if rules is None:
+            rules = self.transitions.get((state, ANY))
+            if rules is None:
+                return
+
+        for rule in rules:
+            if rule.guard is None or rule.guard(device, time):
+                device.enter(rule.target, time, environment)
+                if rule.effect is not None:
+                    rule.effect(device)
+                return
+
+    def states(self) -> set:
+        """Every state that appears in the table."""
+        return {state for state, _ in self.transitions} | {
+            rule.target for rules in self.transitions.values() for rule in rules}
+
+
+def on(states, events, *transitions) -> dict:
+    """Table entries for every (state, event) pair of the given states and events."""
+    if not isinstance(states, (tuple, list)):
+        states = (states,)
+    if not isinstance(events, (tuple, list)):
+        events = (events,)
+    return {(state, event): list(transitions) for state in states for event in events}
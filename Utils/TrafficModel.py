@@ -1,11 +1,357 @@
+import bisect
+import csv
+import gzip
+import json
+import math
 import random
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Iterator, NamedTuple
+
+import numpy as np
 
 
 class TrafficModel:
-    def __init__(self):
-        self.probability: float = 0.0001
+    """
+    Bernoulli trial per tick with the given probability, i.e. geometric
+    inter-arrival times. Arrivals are drawn ahead of time with next_event_time,
+    so random numbers scale with the number of packets, not with the ticks.
+    batch_size > 0 draws the inter-arrival times in NumPy batches.
+    """
+    per_tick = True # event_happened() without a pending arrival falls back to one draw per tick
+    arrival = None  # TraceRecord of the last arrival if the model knows its payload size / SF
+
+    def __init__(self, probability: float = 0.0001, batch_size: int = 0):
+        self.probability: float = probability
+        self.next_event: int | None = None # Arrival drawn ahead of time (event driven engine)
+        self.batch_size: int = batch_size
+        self._batch: list = []
+        self._rng: np.random.Generator | None = None
+
+    def event_happened(self, time: int | None = None) -> bool:
+        if time is not None and (self.next_event is not None or not self.per_tick):
+            if time >= self.next_event_time(time):
+                self.next_event = None
+                return True
+            return False
 
-    def event_happened(self) -> bool:
         if random.uniform(0, 1) < self.probability:
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def next_event_time(self, time: int) -> float:
+        """First tick >= time at which event_happened fires, math.inf if never."""
+        if self.next_event is None:
+            self.next_event = self.draw_arrival(time)
+        return self.next_event
+
+    def draw_arrival(self, time: int) -> float:
+        """
+        The number of Bernoulli trials until the first success is drawn at once
+        from the geometric distribution.
+        """
+        if self.probability <= 0:
+            return math.inf
+        if self.probability >= 1:
+            return time
+        return time - 1 + self._trials()
+
+    def _trials(self) -> int:
+        if self.batch_size <= 0:
+            return 1 + int(math.log(1.0 - random.random()) / math.log(1.0 - self.probability))
+        if not self._batch:
+            self._batch = self.rng().geometric(self.probability, self.batch_size).tolist()
+        return self._batch.pop()
+
+    def rng(self) -> np.random.Generator:
+        # Seeded from the random module, so random.seed() keeps a run reproducible
+        if self._rng is None:
+            self._rng = np.random.default_rng(random.getrandbits(64))
+        return self._rng
+
+    def reset_rng(self) -> None:
+        """Drop the NumPy generator and its batch, the next draw seeds a new one from the random module."""
+        self._rng = None
+        self._batch = []
+
+
+class ExponentialTraffic(TrafficModel):
+    """Poisson arrivals, exponential inter-arrival times with mean 1 / probability ticks."""
+    per_tick = False
+
+    def draw_arrival(self, time: int) -> float:
+        if self.probability <= 0:
+            return math.inf
+        if self.batch_size <= 0:
+            return time + int(random.expovariate(self.probability))
+        if not self._batch:
+            self._batch = self.rng().exponential(1.0 / self.probability, self.batch_size).tolist()
+        return time + int(self._batch.pop())
+
+
+class PeriodicTraffic(TrafficModel):
+    """
+    One arrival every period ticks (1 / probability by default), with a random
+    phase per node. Arrivals while the node is busy are lost.
+    """
+    per_tick = False
+
+    def __init__(self, probability: float = 0.0001, period: int | None = None, offset: int | None = None):
+        super().__init__(probability)
+        if period is None:
+            period = round(1 / probability) if probability > 0 else 0
+        self.period: int = period
+        self.offset: int | None = offset
+
+    def draw_arrival(self, time: int) -> float:
+        if self.period <= 0:
+            return math.inf
+        if self.offset is None:
+            self.offset = random.randrange(self.period)
+        periods = max(0, math.ceil((time - self.offset) / self.period))
+        return self.offset + periods * self.period
+
+
+class MMPPTraffic(TrafficModel):
+    """
+    Bursty traffic, two state Markov-modulated Poisson process. In a burst the
+    rate is burst_factor times the quiet rate; bursts last mean_burst ticks on
+    average and cover burst_fraction of the time. The mean rate is probability.
+    """
+    per_tick = False
+
+    def __init__(self, probability: float = 0.0001, burst_factor: float = 10.0, burst_fraction: float = 0.1,
+                 mean_burst: float = 1000.0):
+        super().__init__(probability)
+        if not 0 < burst_fraction < 1:
+            raise ValueError(f"burst_fraction must be between 0 and 1 (exclusive), got {burst_fraction}")
+        if burst_factor < 1:
+            raise ValueError(f"burst_factor must be at least 1, got {burst_factor}")
+        quiet_rate = probability / (1 - burst_fraction + burst_fraction * burst_factor)
+        self.rates = (quiet_rate, quiet_rate * burst_factor)             # quiet, burst
+        self.mean_sojourn = (mean_burst * (1 - burst_fraction) / burst_fraction, mean_burst)
+        self.state: int | None = None
+        self.state_end: float = 0.0
+
+    def draw_arrival(self, time: int) -> float:
+        if self.probability <= 0:
+            return math.inf
+        if self.state is None:
+            self.state = 1 if random.random() < self.mean_sojourn[1] / sum(self.mean_sojourn) else 0
+            self.state_end = time + random.expovariate(1 / self.mean_sojourn[self.state])
+
+        now = float(time)
+        while True:
+            while self.state_end <= now:
+                self.state = 1 - self.state
+                self.state_end += random.expovariate(1 / self.mean_sojourn[self.state])
+            # Memoryless: an arrival after the state change is drawn again in the next state
+            arrival = now + random.expovariate(self.rates[self.state])
+            if arrival < self.state_end:
+                return int(arrival)
+            now = self.state_end
+
+
+class TraceTraffic(TrafficModel):
+    """Arrivals at the ticks of a trace (sorted). Arrivals while the node is busy are lost."""
+    per_tick = False
+
+    def __init__(self, probability: float = 0.0001, arrivals=()):
+        super().__init__(probability)
+        self.arrivals: list = sorted(arrivals)
+
+    def draw_arrival(self, time: int) -> float:
+        index = bisect.bisect_left(self.arrivals, time)
+        del self.arrivals[:index] # Already past
+        if not self.arrivals:
+            return math.inf
+        return self.arrivals[0]
+
+
+class TraceRecord(NamedTuple):
+    device: str                 # device ID in the trace
+    time: float                 # ms since the epoch of the trace
+    payload_size: int | None    # bytes
+    sf: int | None
+
+
+# Accepted column / key names of the trace fields
+TRACE_FIELDS = {
+    "device": ("device", "device_id", "dev_eui", "deveui", "dev_addr"),
+    "time": ("time", "timestamp", "ts"),
+    "payload_size": ("payload_size", "size", "payload_bytes"),
+    "sf": ("sf", "spreading_factor"),
+}
+TIME_UNITS = {"ms": 1.0, "s": 1000.0}
+
+
+def read_trace(path: str, time_unit: str = "s") -> Iterator[TraceRecord]:
+    """
+    Uplinks of a CSV (with a header row) or JSON lines trace, optionally
+    gzipped, one record at a time. Times are numbers in time_unit or ISO 8601
+    strings; payload size and SF may be missing.
+    """
+    scale = TIME_UNITS[time_unit]
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        name = str(path).removesuffix(".gz")
+        rows = (json.loads(line) for line in f if line.strip()) if name.endswith((".jsonl", ".ndjson", ".json")) \
+            else csv.DictReader(f)
+        for row in rows:
+            values = {field: next((row[key] for key in keys if row.get(key) not in (None, "")), None)
+                      for field, keys in TRACE_FIELDS.items()}
+            if values["device"] is None or values["time"] is None:
+                raise ValueError(f"Trace record without device or time: {row}")
+            time = values["time"]
+            try:
+                time = float(time) * scale
+            except ValueError:
+                time = datetime.fromisoformat(time).timestamp() * 1000.0
+            yield TraceRecord(str(values["device"]), time,
+                              None if values["payload_size"] is None else int(values["payload_size"]),
+                              None if values["sf"] is None else int(values["sf"]))
+
+
+class TraceSource:
+    """
+    One time-sorted trace shared by every node, read lazily in chunks and
+    split into per-node queues. Only the records between the earliest
+    pending arrival and the read horizon are held in memory.
+
+    mapping: trace device -> topology node ID, other devices and nodes
+    missing from node_ids are skipped. Without it trace devices are given to
+    the nodes in order of first appearance, several per node if the trace has
+    more devices than nodes. Trace time start (ms, default the first record)
+    is tick 0 of the run, earlier records are skipped. A node holds at most
+    max_pending arrivals, older ones are dropped as lost (e.g. a node that
+    never asks for its arrivals).
+    """
+
+    def __init__(self, path: str, node_ids, mapping: dict | None = None, time_unit: str = "s",
+                 start: float | None = None, chunk: int = 4096, max_pending: int = 4096):
+        self.path = path
+        self.node_ids = list(node_ids)
+        self._known = set(self.node_ids)
+        self.mapping = dict(mapping) if mapping is not None else {}
+        self.assign = mapping is None
+        self.start = start
+        self.chunk = chunk
+        self.max_pending = max_pending
+
+        self.queues = defaultdict(deque)  # node ID -> (tick, TraceRecord)
+        self.horizon = -1                 # last tick read
+        self._last_time = -math.inf       # trace time of the last record read
+        self.exhausted = False
+        self.read = self.lost = 0         # records read / arrivals missed by busy nodes
+        self._records = read_trace(path, time_unit)
+
+    def next_arrival(self, node_id: str, time: int) -> tuple:
+        """
+        (tick, record) of the first arrival of node_id at or after time. If the
+        trace is not read that far, (tick past the read horizon, None): ask again then.
+        """
+        queue = self.queues[node_id]
+        while True:
+            while queue and queue[0][0] < time: # Also those of a chunk read just now
+                queue.popleft()
+                self.lost += 1
+            if queue or self.exhausted or self.horizon >= time:
+                break
+            self._read_chunk()
+        if queue:
+            return queue[0]
+        return (math.inf if self.exhausted else self.horizon + 1), None
+
+    def pop(self, node_id: str) -> TraceRecord:
+        return self.queues[node_id].popleft()[1]
+
+    def _read_chunk(self) -> None:
+        for _ in range(self.chunk):
+            record = next(self._records, None)
+            if record is None:
+                self.exhausted = True
+                return
+            self.read += 1
+            if self.start is None:
+                self.start = record.time
+            if record.time < self._last_time:
+                raise ValueError(f"{self.path} is not sorted by time (record {self.read}: {record})")
+            self._last_time = record.time
+            tick = int(record.time - self.start)
+            if tick < 0:
+                continue # Before the start of the run
+            self.horizon = tick
+            node_id = self.mapping.get(record.device)
+            if node_id is None:
+                if not self.assign or not self.node_ids:
+                    continue
+                node_id = self.mapping[record.device] = self.node_ids[len(self.mapping) % len(self.node_ids)]
+            if node_id not in self._known:
+                continue
+            queue = self.queues[node_id]
+            if len(queue) >= self.max_pending:
+                queue.popleft()
+                self.lost += 1
+            queue.append((tick, record))
+
+
+class TraceStreamTraffic(TrafficModel):
+    """
+    Arrivals of one node from a shared TraceSource, with the payload size and
+    SF of the trace record. Arrivals while the node is busy are lost.
+    """
+    per_tick = False
+
+    def __init__(self, probability: float = 0.0001, source: TraceSource | None = None, node_id: str | None = None):
+        super().__init__(probability)
+        self.source = source
+        self.node_id = node_id
+
+    def event_happened(self, time: int | None = None) -> bool:
+        if time is None or self.source is None:
+            return False
+        tick, record = self.source.next_arrival(self.node_id, time)
+        if record is None or tick > time:
+            return False
+        self.arrival = self.source.pop(self.node_id)
+        return True
+
+    def next_event_time(self, time: int) -> float:
+        if self.source is None:
+            return math.inf
+        return self.source.next_arrival(self.node_id, time)[0]
+
+
+TRAFFIC_MODELS = {
+    "bernoulli": TrafficModel,
+    "exponential": ExponentialTraffic,
+    "periodic": PeriodicTraffic,
+    "mmpp": MMPPTraffic,
+    "trace": TraceTraffic,
+    "trace_stream": TraceStreamTraffic,
+}
+
+
+def shared_traffic_parameters(name: str, node_ids, parameters: dict) -> dict:
+    """
+    Parameters with the objects shared by all nodes of a simulation built:
+    for "trace_stream" a path (and the TraceSource options) become one TraceSource.
+    """
+    if name == "trace_stream" and "source" not in parameters:
+        return {"source": TraceSource(node_ids=node_ids, **parameters)}
+    return parameters
+
+
+def make_traffic_model(name: str, probability: float, node_id: str | None = None, **parameters) -> TrafficModel:
+    """
+    Traffic model by name. For "trace", arrivals may be a dict of per-node
+    traces keyed by node ID. For "trace_stream", source is the TraceSource
+    of every node (see shared_traffic_parameters).
+    """
+    if name not in TRAFFIC_MODELS:
+        raise ValueError(f"Unknown traffic model {name!r}, expected one of {sorted(TRAFFIC_MODELS)}")
+    if name == "trace" and isinstance(parameters.get("arrivals"), dict):
+        parameters["arrivals"] = parameters["arrivals"].get(node_id, ())
+    if name == "trace_stream":
+        parameters["node_id"] = node_id
+    return TRAFFIC_MODELS[name](probability, **parameters)
@@ -0,0 +1,47 @@
+import bisect
+import functools
+
+
+class TransmitOrder:
+    """
+    Order in which devices run in a tick: transmitters first, then the others,
+    both by device index.
+    Devices report when their action changes, and only those are moved between
+    the two lists at the start of the next tick, so the order of a tick is
+    fixed before any device runs.
+    """
+
+    def __init__(self, devices):
+        self.devices = devices
+        self.transmitters = []          # device indices, sorted
+        self.others = []                # device indices, sorted
+        self._changed = set()           # devices whose action changed since the last update
+
+        for index, device in enumerate(devices):
+            if device.is_transmitting():
+                self.transmitters.append(index)
+            else:
+                self.others.append(index)
+            device.action.listener = functools.partial(self._changed.add, index)
+
+    def __iter__(self):
+        self.update()
+        for index in self.transmitters:
+            yield self.devices[index]
+        for index in self.others:
+            yield self.devices[index]
+
+    def update(self) -> None:
+        for index in self._changed:
+            transmitting = self.devices[index].is_transmitting()
+            source, target = (self.others, self.transmitters) if transmitting else (self.transmitters, self.others)
+            position = bisect.bisect_left(source, index)
+            if position < len(source) and source[position] == index:
+                del source[position]
+                bisect.insort(target, index)
+        self._changed.clear()
+
+    def close(self) -> None:
+        """Stop listening to the devices, e.g. at the end of a phase."""
+        for device in self.devices:
+            device.action.listener = None
@@ -1,21 +1,31 @@
+import sys
+
 
 class LoRaPacket:
-    def __init__(self, generation_ime: int, payload: dict, header: dict, segment_counter: int):
-        self.Source: str = header["source"]
-        self.Destination: str = header.get("destination", "brodcast")
-        self.ID: str = self.Source + self.Destination + str(generation_ime)
+    __slots__ = ("Source", "Destination", "ID", "GenerationTime", "ReceptionTime", "Payload", "Header",
+                 "time_over_air", "sf", "channel", "received_power", "payload_size")
+
+    def __init__(self, generation_ime: int, payload: dict, header: dict, time_over_air: float, packet_id: int):
+        self.Source: str = sys.intern(header["source"])
+        self.Destination: str = sys.intern(header.get("destination", "brodcast"))
+        self.ID: int = packet_id # Unique per simulation, shared by the copies of a packet
         self.GenerationTime: int = generation_ime
         self.ReceptionTime: int = -1 # Undefined
         self.Payload: dict = payload
         self.Header: dict = header
-        self.segment_counter: int = segment_counter
-        self.Segments_required: int
-        self.IsFirstPacket: bool = True
+        self.time_over_air: float = time_over_air # ms, at the SF of generation
 
         # Helper ----------
         self.sf: int = 0
         self.channel: int = 0
         self.received_power = 0
+        self.payload_size: int = 0 # bytes, computed once at generation
+
+    def __copy__(self):
+        packet = LoRaPacket.__new__(LoRaPacket)
+        for name in LoRaPacket.__slots__:
+            object.__setattr__(packet, name, getattr(self, name))
+        return packet
 
     def set_reception_time(self, time: int):
         self.ReceptionTime = time
@@ -1,14 +1,21 @@
 from Wireless.LoRaPacket import LoRaPacket
 
 class WakeUpBeacon:                       # tiny “packet”
+    __slots__ = ("ID",)
+
     def __init__(self, gen_time: int, src_id: str):
         self.ID = f"{src_id}-{gen_time}"
 
 # signals.py
 class Location:
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float = 0, y: float = 0): self.x, self.y = x, y
 
 class LoRaWirelessSignal:
+    __slots__ = ("lora_packet", "channel", "sf", "bandwidth", "tx_power", "source_location", "source_index",
+                 "frame_id", "start_time", "end_time", "rx_power", "time_over_air_required")
+
     def __init__(self, lora_packet: LoRaPacket , node):
         self.lora_packet = lora_packet
         self.channel = node.Channel
@@ -16,6 +23,12 @@ class LoRaWirelessSignal:
         self.bandwidth = node.Bandwidth
         self.tx_power = node.PowerTX
         self.source_location = node.location
+        self.source_index = node.index
+
+        # Frame interval, stamped by the environment (ticks, last tick included)
+        self.frame_id: int | None = None
+        self.start_time: int | None = None
+        self.end_time: int | None = None
 
         # Helpers during capture
         self.rx_power = None
@@ -23,11 +36,16 @@ class LoRaWirelessSignal:
 
 
 class OOKRZWirelessSignal:
+    __slots__ = ("beacon", "channel_MHz", "tx_power_dBm", "source_location", "source_index", "frame_id",
+                 "rx_power_dBm", "time_over_air_required")
+
     def __init__(self, beacon: WakeUpBeacon, source_module, time_over_air: int):
         self.beacon          = beacon
         self.channel_MHz     = source_module.CenterFreq_MHz
         self.tx_power_dBm    = source_module.PowerTX_dBm
         self.source_location = source_module.location
+        self.source_index    = source_module.index
+        self.frame_id        = None    # stamped by the environment
         # arrival power filled in by propagation model later
         self.rx_power_dBm    = None
         self.time_over_air_required =  time_over_air # How many ms is on air
@@ -0,0 +1,219 @@
+"""
+Benchmark runner
+================
+Runs the fixed-seed scenarios of benchmarks.scenarios, each in a fresh
+process so that peak memory is per scenario, and compares them with a
+stored baseline::
+
+    python -m benchmarks.run                          # all scenarios, compare with benchmarks/baseline.json
+    python -m benchmarks.run lorawan-100 multihop --repeat 3
+    python -m benchmarks.run --save-baseline          # record the current tree as the baseline
+
+Per scenario the results hold setup time (building devices and link budget),
+wall time of the join and run phases, simulated ms per wall second, device
+steps (events) per second, peak RSS and the (generated, delivered) counters.
+A timing or memory figure worse than the baseline by more than --tolerance is
+a regression and makes the exit status 1 (durations only if they also grew
+by more than MIN_SECONDS). Different counters mean the
+simulated behaviour changed, they are reported but are no regression.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+__all__ = ["run_scenario", "compare"]
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+RESULTS = Path(__file__).resolve().parent / "results" / "latest.json"
+
+# Metric -> True if higher is better
+METRICS = {
+    "setup_s": False,
+    "join_wall_s": False,
+    "run_wall_s": False,
+    "simulated_ms_per_s": True,
+    "events_per_s": True,
+    "peak_rss_mb": False,
+}
+DURATIONS = ("setup_s", "join_wall_s", "run_wall_s")
+MIN_SECONDS = 0.05  # smaller changes of a duration are timer noise
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    # KiB on Linux, bytes on macOS
+    scale = 1 / 2**20 if sys.platform == "darwin" else 1 / 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_scenario(name: str) -> dict:
+    """Run one scenario in this process (progress output suppressed)."""
+    import random
+    from Simulation import Simulation
+    from benchmarks.scenarios import SCENARIOS
+
+    scenario = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as directory, \
+            contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        topology = Path(directory) / "topology.json"
+        scenario.write_topology(topology)
+        random.seed(scenario.seed)
+
+        start = time.perf_counter()
+        sim = Simulation(scenario.simulation_time, scenario.generation_prob, devices_config=str(topology),
+                         device_type=scenario.device_type, gateway_type=scenario.gateway_type)
+        setup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sim.initialize_network(scenario.join_time)
+        join = time.perf_counter() - start
+        join_ms = sim.environment.time
+
+        run = 0.0
+        if not scenario.join_only:
+            start = time.perf_counter()
+            sim.run()
+            run = time.perf_counter() - start
+
+    generated, delivered = sim.end_of_simulation()
+    simulated_ms, wall = (join_ms, join) if scenario.join_only else (scenario.simulation_time, run)
+    return {
+        "devices": len(sim.Devices),
+        "setup_s": setup,
+        "join_wall_s": join,
+        "join_simulated_ms": join_ms,
+        "joined": sum(device.joined_to_network for device in sim.Devices),
+        "run_wall_s": run,
+        "simulated_ms_per_s": simulated_ms / wall if wall else 0.0,
+        "events": sim.device_steps,
+        "events_per_s": sim.device_steps / (join + run) if join + run else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "generated": generated,
+        "delivered": delivered,
+    }
+
+
+def _run_isolated(name: str) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / "result.json"
+        subprocess.run([sys.executable, "-m", "benchmarks.run", "--child", name, "--output", str(output)],
+                       cwd=ROOT, check=True)
+        return json.loads(output.read_text(encoding="utf-8"))
+
+
+def _best(runs: list) -> dict:
+    """Best figure of each metric over repeated runs, the noise being one-sided."""
+    best = dict(runs[0])
+    for metric, higher in METRICS.items():
+        values = [run[metric] for run in runs if run[metric] is not None]
+        if values:
+            best[metric] = max(values) if higher else min(values)
+    best["repeat"] = len(runs)
+    return best
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple:
+    """(regressions, behaviour changes) as lists of printable lines."""
+    regressions, changes = [], []
+    for name, result in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        for metric, higher in METRICS.items():
+            new, old = result.get(metric), reference.get(metric)
+            if not new or not old:
+                continue
+            ratio = new / old
+            worse = ratio < 1 - tolerance if higher else ratio > 1 + tolerance
+            if metric in DURATIONS and new - old < MIN_SECONDS:
+                worse = False
+            if worse:
+                regressions.append(f"{name}: {metric} {old:.4g} -> {new:.4g} ({ratio - 1:+.1%})")
+        counters = ("generated", "delivered")
+        if any(result.get(key) != reference.get(key) for key in counters):
+            changes.append(f"{name}: (generated, delivered) {tuple(reference.get(k) for k in counters)}"
+                           f" -> {tuple(result.get(k) for k in counters)}")
+    return regressions, changes
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Run the simulator benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"default: all of {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario, the best one is kept")
+    parser.add_argument("--output", type=Path, default=RESULTS)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative slowdown tolerated")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the baseline")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        args.output.write_text(json.dumps(run_scenario(args.child)), encoding="utf-8")
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}, expected some of {list(SCENARIOS)}")
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "scenarios": {},
+    }
+    for name in names:
+        result = _best([_run_isolated(name) for _ in range(args.repeat)])
+        results["scenarios"][name] = result
+        print(f"{name:14s} setup {result['setup_s']:7.3f}s  join {result['join_wall_s']:7.3f}s  "
+              f"run {result['run_wall_s']:7.3f}s  {result['simulated_ms_per_s']:10.0f} ms/s  "
+              f"{result['events_per_s']:9.0f} events/s  {result['peak_rss_mb'] or float('nan'):7.1f} MB")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    regressions, changes = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")),
+                                   args.tolerance)
+    for line in changes:
+        print(f"BEHAVIOUR CHANGED  {line}")
+    for line in regressions:
+        print(f"REGRESSION  {line}")
+    if not regressions:
+        print(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
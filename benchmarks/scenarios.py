@@ -0,0 +1,76 @@
+"""
+Fixed-seed benchmark scenarios
+==============================
+Each scenario either uses a topology file of the repository or builds one
+from its own seed, so the same scenario always simulates the same network
+and traffic.
+"""
+from __future__ import annotations
+
+import json
+import math
+import random
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from Devices.LoRaWANClassANode import LoRaWANNode
+from Devices.LoRaWANGateway import LoRaWANGateway
+from Devices.Multihop1Node import Multihop1Node
+from Devices.MultihopGateway import MultihopGateway
+
+__all__ = ["Scenario", "SCENARIOS"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    simulation_time: int            # run phase (ms), 0 for a join-only scenario
+    generation_prob: float          # per node and ms
+    nodes: int = 0                  # nodes placed at random on a disc of radius_m ...
+    radius_m: float = 2000
+    gateways: int = 1               # first at the centre, the others evenly on a circle of radius_m / 2
+    topology: str | None = None     # ... unless a fixed topology file is given
+    join_time: int | None = None    # cap of the join phase (ms), None -> until every node joined
+    seed: int = 0
+    device_type: type = LoRaWANNode
+    gateway_type: type = LoRaWANGateway
+
+    @property
+    def join_only(self) -> bool:
+        return self.simulation_time == 0
+
+    def write_topology(self, path: Path) -> None:
+        if self.topology is not None:
+            shutil.copyfile(self.topology, path)
+            return
+
+        rng = random.Random(self.seed)
+        nodes = []
+        for i in range(self.nodes):
+            r = self.radius_m * math.sqrt(rng.random())
+            theta = rng.uniform(0, 2 * math.pi)
+            nodes.append({
+                "ID": f"{i + 1}-end",
+                "Location": {"x": round(r * math.cos(theta), 2), "y": round(r * math.sin(theta), 2)},
+                "default_sf": rng.randint(7, 12),
+                "default_channel": rng.randint(1, 9),
+            })
+        gateways = [{"ID": "1-gw", "Location": {"x": 0, "y": 0}}]
+        for i in range(1, self.gateways):
+            theta = 2 * math.pi * i / (self.gateways - 1)
+            gateways.append({"ID": f"{i + 1}-gw", "Location": {"x": round(self.radius_m / 2 * math.cos(theta), 2),
+                                                               "y": round(self.radius_m / 2 * math.sin(theta), 2)}})
+        topology = {"Nodes": nodes, "Gateways": gateways}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(topology, f, indent=2)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario("lorawan-10", 300_000, 1e-4, nodes=10),
+    Scenario("lorawan-100", 60_000, 1e-4, nodes=100),
+    Scenario("lorawan-1000", 60_000, 1e-5, nodes=1000, radius_m=4000, gateways=10, join_time=60_000),
+    Scenario("multihop", 100_000, 1e-4, topology="Topology/topology.json",
+             device_type=Multihop1Node, gateway_type=MultihopGateway),
+    Scenario("join-100", 0, 0.0, nodes=100),
+]}
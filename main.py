@@ -1,12 +1,11 @@
 from Metrics import Statistics
-from Simulation import Simulation
+from Sweep import run_replications
 # from Topology.Simple_topology_1 import TopologyGenerator
 from Topology.Multihop_topology import MultihopTopologyGenerator
 from Devices.LoRaWANClassANode import LoRaWANNode
 from Devices.LoRaWANGateway import LoRaWANGateway
 from Devices.Multihop1Node import Multihop1Node
 from Devices.MultihopGateway import MultihopGateway
-from Topology.plot import gateways
 
 # ============================================================================
 # SIMULATION PARAMETERS
@@ -18,6 +17,14 @@ DEFAULT_SF = 12
 DEFAULT_CHANNEL = 1
 SIMULATION_TIME = 500000
 SLOT_MS = 31
+SEED = 0           # point i of a sweep is seeded with SEED + i
+PROCESSES = None   # worker processes for the sweep, None -> all cores
+REPLICATIONS = 1   # seeds per load point (batch size of the sequential stopping)
+CI_TARGET = None   # e.g. 0.01: add seeds until the 95% CI half width of S is below it
+MAX_REPLICATIONS = 30
+JOIN_CHECKPOINTS = "Checkpoints"   # join once under SEED, every load and seed restores it, None -> join per run
+RESULTS_CACHE = "Cache"   # reuse the results of runs already simulated (same inputs, seed and code), None -> off
+PLOT = False       # plot the throughput / loss curves at the end; the topology: python -m Topology.plot
 
 # ============================================================================
 # PROTOCOL SELECTION
@@ -46,30 +53,42 @@ TRAFFIC_LOADS = [1, 1.5, 2, 2.5, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, 10]
 # topology_generator.generate() # Writes the topology in topology.json
 
 # Run experiments for each protocol
-for protocol_config in PROTOCOLS_TO_TEST:
-    protocol_name = protocol_config["name"]
-    device_type = protocol_config["device_type"]
-    gateway_type = protocol_config["gateway_type"]
+if __name__ == "__main__":
+    for protocol_config in PROTOCOLS_TO_TEST:
+        protocol_name = protocol_config["name"]
+        device_type = protocol_config["device_type"]
+        gateway_type = protocol_config["gateway_type"]
 
-    print(f"\n{'='*70}")
-    print(f"Testing Protocol: {protocol_name}")
-    print(f"{'='*70}\n")
+        print(f"\n{'='*70}")
+        print(f"Testing Protocol: {protocol_name}")
+        print(f"{'='*70}\n")
 
-    statistics = Statistics.AlohaValidation()
+        statistics = Statistics.AlohaValidation()
 
-    for i in TRAFFIC_LOADS:
-        gen_probability = 1 / (i * SLOT_MS * NUMBER_OF_NODES)
+        # Create the simulations of every load with selected device type, run them in parallel
+        points = [{"simulation_time": SIMULATION_TIME,
+                   "generation_prob": 1 / (i * SLOT_MS * NUMBER_OF_NODES),
+                   "device_type": device_type,
+                   "gateway_type": gateway_type,
+                   "checkpoint_dir": JOIN_CHECKPOINTS,
+                   "join_seed": SEED,
+                   "results_cache": RESULTS_CACHE} for i in TRAFFIC_LOADS]
+        slots = SIMULATION_TIME / SLOT_MS
+        results = run_replications(points, replications=REPLICATIONS, processes=PROCESSES, seed=SEED,
+                                   ci_target=CI_TARGET, max_replications=MAX_REPLICATIONS,
+                                   statistic=lambda generated, received: received / slots)
 
-        # Create simulation with selected device type
-        sim = Simulation(SIMULATION_TIME, gen_probability, device_type=device_type, gateway_type=gateway_type)
-        sim.initialize_network()
-        sim.run()
+        for i, point, replications in zip(TRAFFIC_LOADS, points, results):
+            for generated_packets, successfully_received in replications:
+                print(f"Load factor {i}: Generated={generated_packets}, Received={successfully_received}")
 
-        generated_packets, successfully_received = sim.end_of_simulation()
-        print(f"Load factor {i}: Generated={generated_packets}, Received={successfully_received}")
+            statistics.add_replications(point["generation_prob"], replications,
+                                        sim_duration_ms=SIMULATION_TIME, slot_ms=SLOT_MS, n_nodes=NUMBER_OF_NODES)
 
-        statistics.add_run(gen_probability, generated_packets, successfully_received,
-                          sim_duration_ms=SIMULATION_TIME, slot_ms=SLOT_MS, n_nodes=NUMBER_OF_NODES)
+        for row in statistics.summary():
+            print(f"G={row['G_mean']:.3f} ± {row['G_ci']:.3f}  S={row['S_mean']:.3f} ± {row['S_ci']:.3f}  "
+                  f"({row['replications']} seeds)")
 
-    # Plot results for this protocol
-    statistics.plot(f"{protocol_name} - Performance")
+        # Plot results for this protocol
+        if PLOT:
+            statistics.plot(f"{protocol_name} - Performance")
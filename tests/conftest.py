@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def in_repo(monkeypatch):
+    """Run from the repository root, the simulator reads its configurations by relative path."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
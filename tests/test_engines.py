@@ -0,0 +1,62 @@
+import contextlib
+import io
+import json
+import math
+
+import pytest
+
+from Devices.LoRaWANClassANode import LoRaWANNode
+from Devices.LoRaWANGateway import LoRaWANGateway
+from Devices.Multihop1Node import Multihop1Node
+from Devices.MultihopGateway import MultihopGateway
+from Simulation import Simulation
+
+
+def _topology(path, nodes: int = 8) -> str:
+    """End devices on a circle around one gateway, close enough to collide while joining."""
+    devices = [{"ID": f"{i}-end", "Location": {"x": round(800 * math.cos(i), 1), "y": round(800 * math.sin(i), 1)},
+                "default_sf": 7, "default_channel": 1} for i in range(1, nodes + 1)]
+    path.write_text(json.dumps({"Nodes": devices, "Gateways": [{"ID": "1-gw", "Location": {"x": 0, "y": 0}}]}))
+    return str(path)
+
+
+def _trace(path, devices: int = 4, packets: int = 60, spacing_ms: int = 500) -> str:
+    rows = [f"dev{k % devices},{k * spacing_ms + 37 * (k % devices)},{10 + k % 7},{7 + k % 3}"
+            for k in range(packets)]
+    path.write_text("device,time,payload_size,sf\n" + "\n".join(rows) + "\n")
+    return str(path)
+
+
+def _run(engine, device_type, gateway_type, topology, trace):
+    sim = Simulation(30_000, 0.0, devices_config=topology, device_type=device_type, gateway_type=gateway_type,
+                     engine=engine, seed=1, traffic_model="trace_stream",
+                     traffic_parameters={"path": trace, "time_unit": "ms", "chunk": 8})
+    events = []
+    for device in sim.Devices:
+        for name in ("join_driver", "protocol_driver"):
+            driver = getattr(device, name)
+
+            def logged(interrupt, time, environment, driver=driver, device=device, name=name):
+                if interrupt is not None:
+                    events.append((name, time, device.lora.ID, interrupt.name))
+                return driver(interrupt, time, environment)
+            setattr(device, name, logged)
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        sim.initialize_network()
+        sim.run()
+    metrics = sim.metrics
+    return (events, sim.end_of_simulation(), metrics.decoded, metrics.interfered, metrics.no_path,
+            [(device.lora.ID, device.lora.SF, device.joined_to_network) for device in sim.Devices])
+
+
+@pytest.mark.parametrize("device_type, gateway_type", [(LoRaWANNode, LoRaWANGateway),
+                                                        (Multihop1Node, MultihopGateway)])
+def test_event_engine_matches_tick_loop(in_repo, tmp_path, device_type, gateway_type):
+    topology = _topology(tmp_path / "topology.json")
+    trace = _trace(tmp_path / "trace.csv")
+    tick = _run("tick", device_type, gateway_type, topology, trace)
+    event = _run("event", device_type, gateway_type, topology, trace)
+
+    assert event == tick
+    assert tick[1][0] > 0 # Some traffic went through
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import Utils.Computations
+from Physics.LinkBudget import LinkBudget
+from Utils.SpatialIndex import GridIndex
+
+
+def _positions(n: int, size: float, seed: int):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-size, size, n), rng.uniform(-size, size, n)
+
+
+def _brute_force_pairs(x, y, radius):
+    distance = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    i, j = np.nonzero((distance <= radius) & ~np.eye(len(x), dtype=bool))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("radius, cell_size", [(100.0, 100.0), (250.0, 400.0), (1.0, 1.0)])
+def test_grid_pairs_match_brute_force(seed, radius, cell_size):
+    x, y = _positions(300, 1000.0, seed)
+    first, second = GridIndex(x, y, cell_size).pairs_within(radius)
+
+    pairs = list(zip(first.tolist(), second.tolist()))
+    assert len(pairs) == len(set(pairs)) # Each ordered pair once
+    assert set(pairs) == _brute_force_pairs(x, y, radius)
+
+
+def test_grid_rejects_radius_above_cell_size():
+    x, y = _positions(10, 100.0, 0)
+    with pytest.raises(ValueError):
+        GridIndex(x, y, 10.0).pairs_within(20.0)
+
+
+def test_grid_handles_coincident_and_negative_positions():
+    x = np.array([-5.0, -5.0, 5.0, -15.0])
+    y = np.array([-5.0, -5.0, 5.0, -5.0])
+    first, second = GridIndex(x, y, 10.0).pairs_within(10.0)
+    assert set(zip(first.tolist(), second.tolist())) == _brute_force_pairs(x, y, 10.0)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_link_budget_matches_brute_force(seed):
+    x, y = _positions(200, 20_000.0, seed)
+    power = np.random.default_rng(seed).choice([14.0, 20.0], len(x))
+    sensitivity = -130.0
+    links = LinkBudget.from_positions(x, y, power, sensitivity)
+    assert 0 < len(links) < len(x) * (len(x) - 1) # Some links, not all of them
+
+    sources, receivers = np.meshgrid(np.arange(len(x)), np.arange(len(x)), indexing="ij")
+    expected = Utils.Computations.received_power_pairs(x, y, power, sources.ravel(), receivers.ravel())
+    expected = expected.reshape(len(x), len(x)) # [source, receiver]
+
+    everyone = np.arange(len(x))
+    for receiver in range(len(x)):
+        received = links.received_power(everyone, receiver)
+        stored = np.isfinite(received)
+        # A stored link has the exact power, a link left out is below the sensitivity
+        np.testing.assert_allclose(received[stored], expected[stored, receiver])
+        assert not stored[receiver]
+        others = ~stored & (everyone != receiver)
+        assert np.all(expected[others, receiver] < sensitivity)
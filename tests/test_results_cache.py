@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from Simulation import Simulation
+from Utils.ResultsCache import ResultsCache, code_version, results_key
+
+
+def _age(path, seconds_ago: float) -> None:
+    now = path.stat().st_mtime
+    os.utime(path, (now - seconds_ago, now - seconds_ago))
+
+
+def test_put_get(tmp_path):
+    cache = ResultsCache(tmp_path)
+    assert cache.get("k") is None
+    path = cache.put("k", {"generated": 3, "delivered": 2})
+    assert path.parent.name == code_version()
+    assert cache.get("k") == {"version": 1, "generated": 3, "delivered": 2}
+    assert cache.size() == path.stat().st_size
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResultsCache(tmp_path)
+    paths = {key: cache.put(key, {"payload": key * 1000}) for key in "abc"}
+    for age, key in zip((30, 20, 10), "abc"):
+        _age(paths[key], age)
+    assert cache.get("a") is not None # A hit makes it the most recently used
+
+    cache.max_bytes = cache.size() - 1
+    assert cache.evict() == 1
+    assert not paths["b"].exists()
+    assert paths["a"].exists() and paths["c"].exists()
+
+    cache.max_bytes = 0
+    assert cache.evict() == 2 and cache.entries() == []
+
+
+def test_put_evicts_down_to_max_bytes(tmp_path):
+    cache = ResultsCache(tmp_path, max_bytes=1)
+    cache.put("a", {"x": 1})
+    cache.put("b", {"x": 2})
+    assert len(cache.entries()) <= 1
+
+
+@pytest.mark.parametrize("corrupt", [lambda data: data[:len(data) // 2], lambda data: b"junk", lambda data: b""])
+def test_unreadable_entry_is_a_miss_and_deleted(tmp_path, corrupt):
+    cache = ResultsCache(tmp_path)
+    path = cache.put("k", {"x": list(range(100))})
+    path.write_bytes(corrupt(path.read_bytes()))
+    assert cache.get("k") is None
+    assert not path.exists()
+
+
+def test_prune_keeps_the_current_code_version(tmp_path):
+    cache = ResultsCache(tmp_path)
+    current = cache.put("k", {"x": 1})
+    old = tmp_path / "0ldversion00" / "k.pkl.gz"
+    old.parent.mkdir()
+    old.write_bytes(current.read_bytes())
+    assert cache.prune() == 1
+    assert current.exists() and not old.parent.exists()
+
+
+def test_key_depends_on_the_run_inputs(in_repo):
+    def key(**kwargs):
+        parameters = {"simulation_time": 1000, "generation_prob": 0.001, "seed": 1, **kwargs}
+        return results_key(Simulation(**parameters), None)
+
+    assert key() == key()
+    assert len({key(), key(seed=2), key(join_seed=1), key(generation_prob=0.002), key(engine="tick"),
+                key(interference_model="sinr")}) == 6
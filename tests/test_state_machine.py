@@ -0,0 +1,69 @@
+import pytest
+
+import Devices.LoRaWANClassANode as lorawan
+import Devices.LoRaWANGateway as gateway
+import Devices.Multihop1Node as multihop
+from Utils.StateMachine import ANY, StateMachine, Transition, on
+
+
+class Device:
+    def __init__(self, state: int = 0):
+        self.state = state
+        self.entered = []
+        self.effects = []
+
+    def enter(self, state, time, environment):
+        self.state = state
+        self.entered.append((state, time))
+
+
+def test_first_transition_whose_guard_holds_is_taken():
+    fsm = StateMachine({
+        **on(0, "go", Transition(1, guard=lambda device, time: time > 10), Transition(2)),
+    })
+    device = Device()
+    fsm.dispatch(device, "go", 5, None)
+    assert device.entered == [(2, 5)]
+
+    device = Device()
+    fsm.dispatch(device, "go", 11, None)
+    assert device.entered == [(1, 11)]
+
+
+def test_any_only_without_an_entry_for_the_event():
+    fsm = StateMachine({
+        **on(0, "go", Transition(1)),
+        **on(0, ANY, Transition(2)),
+    })
+    for event, target in (("go", 1), ("other", 2), (None, 2)):
+        device = Device()
+        fsm.dispatch(device, event, 0, None)
+        assert device.state == target
+
+
+def test_no_transition_leaves_the_state():
+    fsm = StateMachine({**on(0, "go", Transition(1, guard=lambda device, time: False))})
+    device = Device()
+    fsm.dispatch(device, "go", 0, None)
+    fsm.dispatch(device, "unknown", 0, None)
+    assert device.state == 0 and device.entered == []
+
+
+def test_effect_runs_after_entering_and_one_transition_per_call():
+    fsm = StateMachine({
+        **on((0, 1), "go", Transition(1, effect=lambda device: device.effects.append(device.state))),
+        **on(1, "go", Transition(2)),
+    })
+    device = Device()
+    fsm.dispatch(device, "go", 0, None)
+    assert device.effects == [1] and device.entered == [(1, 0)]
+
+
+@pytest.mark.parametrize("device_class, tables", [
+    (lorawan.LoRaWANNode, (lorawan.PROTOCOL_FSM, lorawan.PROTOCOL_FSM_NO_WINDOWS, lorawan.JOIN_FSM)),
+    (gateway.LoRaWANGateway, (gateway.JOIN_FSM,)),
+    (multihop.Multihop1Node, (multihop.JOIN_FSM,)),
+])
+def test_every_state_of_the_tables_has_an_action(device_class, tables):
+    for table in tables:
+        assert table.states() <= set(device_class.STATE_ACTIONS)
@@ -0,0 +1,88 @@
+import gzip
+import json
+import math
+
+import pytest
+
+from Utils.TrafficModel import TraceSource, TraceStreamTraffic, read_trace
+
+
+def _csv(path, rows) -> str:
+    path.write_text("device,time\n" + "".join(f"{device},{time}\n" for device, time in rows))
+    return str(path)
+
+
+def _drain(source, node_id, time=0):
+    ticks = []
+    while True:
+        tick, record = source.next_arrival(node_id, time)
+        if record is None:
+            if tick == math.inf:
+                return ticks
+            time = tick
+            continue
+        ticks.append(tick)
+        source.pop(node_id)
+        time = tick + 1
+
+
+def test_ticks_count_from_the_first_record(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", 1000), ("b", 1004), ("a", 1010)])
+    source = TraceSource(path, ["n1", "n2"], time_unit="ms")
+    assert _drain(source, "n1") == [0, 10]
+    assert _drain(source, "n2") == [4]
+    assert source.mapping == {"a": "n1", "b": "n2"}
+
+
+def test_start_skips_earlier_records(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", 1), ("a", 5), ("a", 12), ("a", 20)])
+    source = TraceSource(path, ["n1"], time_unit="ms", start=10, chunk=1)
+    assert _drain(source, "n1") == [2, 10]
+    assert source.read == 4 and source.lost == 0
+
+
+def test_unsorted_trace_is_rejected(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", 10), ("b", 5)])
+    source = TraceSource(path, ["n1", "n2"], time_unit="ms", start=0)
+    with pytest.raises(ValueError, match="not sorted"):
+        source.next_arrival("n1", 100)
+
+
+def test_mapping_skips_other_devices_and_unknown_nodes(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", 0), ("b", 1), ("c", 2), ("a", 3)])
+    source = TraceSource(path, ["n1"], mapping={"a": "n1", "c": "gone"}, time_unit="ms")
+    assert _drain(source, "n1") == [0, 3]
+    assert set(source.queues) <= {"n1"}
+
+
+def test_max_pending_drops_the_oldest_arrivals(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", t) for t in range(10)] + [("b", 100)])
+    source = TraceSource(path, ["n1", "n2"], time_unit="ms", max_pending=3)
+    assert _drain(source, "n2") == [100] # Reads all of n1's arrivals without asking for them
+    assert [tick for tick, _ in source.queues["n1"]] == [7, 8, 9]
+    assert source.lost == 7
+
+
+def test_arrivals_of_a_late_chunk_before_the_asked_time_are_lost(tmp_path):
+    path = _csv(tmp_path / "trace.csv", [("a", 1), ("b", 2), ("a", 5), ("b", 6), ("a", 9), ("b", 10)])
+    source = TraceSource(path, ["n1", "n2"], time_unit="ms", start=0, chunk=2)
+    tick, record = source.next_arrival("n1", 8)
+    assert (tick, record.time) == (9, 9.0)
+    assert source.lost == 2
+
+
+def test_stream_traffic_reads_payload_and_sf(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        for time, size, sf in ((0.0, 12, 9), (0.5, 20, 7)):
+            f.write(json.dumps({"dev_eui": "a", "timestamp": time, "size": size, "sf": sf}) + "\n")
+    assert [record.payload_size for record in read_trace(str(path))] == [12, 20]
+
+    source = TraceSource(str(path), ["n1"])
+    traffic = TraceStreamTraffic(source=source, node_id="n1")
+    assert traffic.next_event_time(0) == 0
+    assert traffic.event_happened(0) and traffic.arrival.sf == 9
+    assert not traffic.event_happened(1)
+    assert traffic.next_event_time(1) == 500
+    assert traffic.event_happened(500) and traffic.arrival.payload_size == 20
+    assert traffic.next_event_time(501) == math.inf